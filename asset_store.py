@@ -0,0 +1,344 @@
+import os
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+import http_client
+import tracing
+
+load_dotenv()
+
+DEFAULT_ASSET_DIR = os.path.join("data", "assets")
+# Quota disque du magasin (originaux + variantes), en Mo ; 0 = illimité
+ASSET_STORE_MAX_MB = float(os.getenv("ASSET_STORE_MAX_MB", "1024"))
+# Variantes pré-redimensionnées à chaque ajout, ex. "1280x720,320x180" (sinon créées à la demande)
+ASSET_VARIANTS = os.getenv("ASSET_VARIANTS", "")
+
+CONTENT_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+def parse_sizes(value):
+    """"1280x720,320x180" -> [(1280, 720), (320, 180)]"""
+    sizes = []
+    for item in value.split(","):
+        if "x" in item:
+            width, height = item.strip().lower().split("x")
+            sizes.append((int(width), int(height)))
+    return sizes
+
+
+def cover_resize(image, size):
+    """Recadrage "cover" : remplir tout le cadre sans déformer"""
+    scale = max(size[0] / image.width, size[1] / image.height)
+    image = image.resize((max(size[0], round(image.width * scale)),
+                          max(size[1], round(image.height * scale))))
+    left = (image.width - size[0]) // 2
+    top = (image.height - size[1]) // 2
+    return image.crop((left, top, left + size[0], top + size[1]))
+
+
+class AssetStore:
+    """Magasin local d'images adressé par contenu (SHA-256).
+
+    Chaque URL n'est téléchargée qu'une fois ; deux URLs servant le même fichier partagent
+    un seul exemplaire sur disque. Les moins récemment utilisées sont évincées au-delà du quota."""
+
+    def __init__(self, root=None, max_bytes=None, variants=None):
+        self.root = root or os.getenv("ASSET_STORE_DIR", DEFAULT_ASSET_DIR)
+        if max_bytes is None:
+            max_bytes = int(ASSET_STORE_MAX_MB * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.variants = parse_sizes(ASSET_VARIANTS) if variants is None else variants
+
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self._url_locks = {}
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS assets (
+                    hash TEXT PRIMARY KEY,
+                    ext TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS variants (
+                    hash TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    PRIMARY KEY (hash, name)
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_last_access ON assets(last_access)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_hash ON urls(hash)")
+
+    def _object_path(self, digest, ext):
+        return os.path.join(self.root, "objects", digest[:2], digest + ext)
+
+    def _variant_path(self, digest, width, height):
+        return os.path.join(self.root, "variants", digest[:2], f"{digest}_{width}x{height}.jpg")
+
+    def _touch(self, digest):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE assets SET last_access = ? WHERE hash = ?", (time.time(), digest))
+
+    def lookup_url(self, url):
+        """Hash de l'image déjà téléchargée pour cette URL, ou None (aucun accès réseau)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT assets.hash, assets.ext FROM urls JOIN assets ON assets.hash = urls.hash WHERE urls.url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(self._object_path(*row)):
+            self.remove(row[0])
+            return None
+        self._touch(row[0])
+        return row[0]
+
+    def path(self, digest):
+        """Chemin du fichier original, ou None s'il n'est plus dans le magasin"""
+        with self.lock:
+            row = self.conn.execute("SELECT ext FROM assets WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        path = self._object_path(digest, row[0])
+        if not os.path.exists(path):
+            self.remove(digest)
+            return None
+        self._touch(digest)
+        return path
+
+    def fetch(self, url):
+        """Renvoie le hash de l'image de cette URL, en la téléchargeant si elle n'est pas encore connue"""
+        digest = self.lookup_url(url)
+        if digest:
+            return digest
+        # Un seul téléchargement en vol par URL
+        with self.lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            return self.lookup_url(url) or self._download(url)
+
+    @tracing.traced("assets.download")
+    def _download(self, url):
+        tracing.annotate(url=url)
+        response = http_client.get(url, stream=True, timeout=(5, 30))
+        try:
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}")
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+            ext = CONTENT_TYPES.get(content_type) or os.path.splitext(urlparse(url).path)[1].lower() or ".jpg"
+
+            sha = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        sha.update(chunk)
+                        f.write(chunk)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        finally:
+            response.close()
+
+        digest = self._add_file(tmp_path, sha.hexdigest(), ext)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (url, digest))
+        return digest
+
+    def put_bytes(self, data, ext=".jpg"):
+        """Ajoute un contenu déjà en mémoire et renvoie son hash"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return self._add_file(tmp_path, hashlib.sha256(data).hexdigest(), ext)
+
+    def _add_file(self, tmp_path, digest, ext):
+        """Range le fichier temporaire sous son hash ; un contenu déjà présent n'est pas dupliqué"""
+        with self.lock:
+            row = self.conn.execute("SELECT ext FROM assets WHERE hash = ?", (digest,)).fetchone()
+        if row is not None and os.path.exists(self._object_path(digest, row[0])):
+            os.remove(tmp_path)
+            self._touch(digest)
+            return digest
+
+        path = self._object_path(digest, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO assets (hash, ext, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (digest, ext, os.path.getsize(path), now, now)
+            )
+
+        for width, height in self.variants:
+            try:
+                self.variant(digest, width, height)
+            except Exception as e:
+                print(f"⚠️ Variante {width}x{height} impossible pour {digest[:12]}: {e}")
+        self.evict(keep=digest)
+        return digest
+
+    def variant(self, digest, width, height):
+        """Chemin d'une copie JPEG recadrée à width x height, créée au premier appel"""
+        path = self._variant_path(digest, width, height)
+        if os.path.exists(path):
+            self._touch(digest)
+            return path
+        source = self.path(digest)
+        if source is None:
+            return None
+
+        from PIL import Image
+
+        with Image.open(source) as image:
+            resized = cover_resize(image.convert("RGB"), (width, height))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".jpg")
+        os.close(fd)
+        resized.save(tmp_path, "JPEG", quality=90)
+        os.replace(tmp_path, path)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO variants (hash, name, size) VALUES (?, ?, ?)",
+                              (digest, f"{width}x{height}", os.path.getsize(path)))
+        return path
+
+    def remove(self, digest):
+        """Supprime un asset, ses variantes et les URLs qui y mènent"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT ext FROM assets WHERE hash = ?", (digest,)).fetchone()
+            names = [name for (name,) in self.conn.execute("SELECT name FROM variants WHERE hash = ?", (digest,))]
+            self.conn.execute("DELETE FROM assets WHERE hash = ?", (digest,))
+            self.conn.execute("DELETE FROM variants WHERE hash = ?", (digest,))
+            self.conn.execute("DELETE FROM urls WHERE hash = ?", (digest,))
+        paths = [self._variant_path(digest, *map(int, name.split("x"))) for name in names]
+        if row is not None:
+            paths.append(self._object_path(digest, row[0]))
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def total_bytes(self):
+        with self.lock:
+            assets = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+            variants = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM variants").fetchone()[0]
+        return assets + variants
+
+    def evict(self, keep=None, max_bytes=None):
+        """Évince les assets les moins récemment utilisés jusqu'à repasser sous le quota ;
+        renvoie le nombre d'assets supprimés"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes <= 0:
+            return 0
+        overflow = self.total_bytes() - max_bytes
+        removed = 0
+        while overflow > 0:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT hash, size + (SELECT COALESCE(SUM(size), 0) FROM variants WHERE variants.hash = assets.hash) "
+                    "FROM assets WHERE hash != ? ORDER BY last_access ASC LIMIT 50",
+                    (keep or "",)
+                ).fetchall()
+            if not rows:
+                break
+            for digest, size in rows:
+                self.remove(digest)
+                removed += 1
+                overflow -= size
+                if overflow <= 0:
+                    break
+        return removed
+
+    def stats(self):
+        with self.lock:
+            assets, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM assets").fetchone()
+            variants, variants_size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM variants").fetchone()
+            urls = self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {"assets": assets, "urls": urls, "variants": variants, "bytes": size + variants_size,
+                "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Magasin partagé du processus"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AssetStore()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Magasin local d'images adressé par contenu")
+    parser.add_argument("--dir", default=None, help=f"Dossier du magasin (défaut: {DEFAULT_ASSET_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Nombre d'images, d'URLs et taille sur disque")
+
+    fetch_parser = sub.add_parser("fetch", help="Télécharger des images dans le magasin")
+    fetch_parser.add_argument("urls", nargs="+")
+
+    evict_parser = sub.add_parser("evict", help="Repasser sous le quota")
+    evict_parser.add_argument("--max-mb", type=float, help="Quota à appliquer (défaut: ASSET_STORE_MAX_MB)")
+
+    sub.add_parser("purge", help="Vider le magasin")
+
+    args = parser.parse_args()
+    store = AssetStore(args.dir)
+
+    if args.command == "stats":
+        stats = store.stats()
+        quota = f"{stats['max_bytes'] / (1024 * 1024):.0f} Mo" if stats["max_bytes"] > 0 else "illimité"
+        print(f"🖼️ {stats['assets']} images, {stats['variants']} variantes, {stats['urls']} URLs, "
+              f"{stats['bytes'] / (1024 * 1024):.1f} Mo (quota {quota})")
+    elif args.command == "fetch":
+        for url in args.urls:
+            try:
+                digest = store.fetch(url)
+                print(f"✅ {digest} <- {url}")
+            except Exception as e:
+                print(f"❌ {url}: {e}")
+    elif args.command == "evict":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        removed = store.evict(max_bytes=max_bytes)
+        print(f"🧹 {removed} images évincées")
+    elif args.command == "purge":
+        with store.lock:
+            digests = [digest for (digest,) in store.conn.execute("SELECT hash FROM assets")]
+        for digest in digests:
+            store.remove(digest)
+        print(f"🧹 {len(digests)} images supprimées")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import csv
+import copy
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import language_detection
+from script_generator import ScriptGenerator, GENERATION_MODES
+from image_manager import ImageManager
+from create_video_from_script import AVATAR_IDS, create_video_from_script
+from video_subtitles import add_subtitles_to_video
+from exporters import export_script, available_formats
+
+
+def load_requests(path):
+    """Lit les demandes d'un fichier JSONL (objet ou chaîne par ligne) ou CSV (colonne prompt)"""
+    items = []
+    if path.lower().endswith(".csv"):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                items.append(dict(row))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                data = json.loads(line)
+                items.append({"prompt": data} if isinstance(data, str) else data)
+
+    requests_list = []
+    for item in items:
+        prompt = (item.get("prompt") or "").strip()
+        if not prompt:
+            print(f"⚠️ Demande ignorée (prompt vide): {item}")
+            continue
+        formats = item.get("formats")
+        if isinstance(formats, str):
+            formats = [fmt.strip() for fmt in formats.replace("|", ",").split(",") if fmt.strip()]
+        video = item.get("video")
+        if isinstance(video, str):
+            video = video.strip().lower() in ("1", "true", "yes", "oui")
+        requests_list.append({
+            # Identifiant stable pour reconnaître une demande déjà traitée lors d'une relance
+            "id": str(item.get("id") or hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]),
+            "prompt": prompt,
+            "formats": formats,
+            "video": video,
+        })
+    return requests_list
+
+
+class BatchRunner:
+    """Traite une liste de demandes de formation avec un pool de workers et des limites par service"""
+
+    def __init__(self, output_dir="batch_output", workers=4, gemini_concurrency=2,
+                 image_concurrency=2, synthesia_concurrency=1, formats=None, video=False,
+                 force_regenerate=False, video_backend=None, generation_mode=None):
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.formats = formats or ["json"]
+        self.video = video
+        self.force_regenerate = force_regenerate
+        self.video_backend = video_backend
+        self.generation_mode = generation_mode
+        self.gemini_slots = threading.BoundedSemaphore(max(1, gemini_concurrency))
+        self.image_slots = threading.BoundedSemaphore(max(1, image_concurrency))
+        self.synthesia_slots = threading.BoundedSemaphore(max(1, synthesia_concurrency))
+
+        # Un seul gestionnaire d'images : ses limiteurs de débit valent pour tous les workers
+        self.image_manager = ImageManager()
+        self._local = threading.local()
+
+        self.manifest_path = os.path.join(output_dir, "manifest.json")
+        self.manifest_lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"items": {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _record(self, item_id, entry):
+        with self.manifest_lock:
+            # Copie : le worker continue de modifier son entrée pendant que les autres sauvegardent
+            self.manifest["items"][item_id] = copy.deepcopy(entry)
+            self._save_manifest()
+
+    def _generator(self):
+        """Un ScriptGenerator par worker, créé au premier usage"""
+        generator = getattr(self._local, "generator", None)
+        if generator is None:
+            generator = ScriptGenerator(image_manager=self.image_manager, mode=self.generation_mode)
+            self._local.generator = generator
+        return generator
+
+    def _checkpoint(self, item_id, entry, stage=None):
+        """Enregistre l'avancement de la demande : une relance reprend après la dernière étape terminée"""
+        if stage and stage not in entry["stages"]:
+            entry["stages"].append(stage)
+        self._record(item_id, entry)
+
+    @tracing.traced("batch.item")
+    def process(self, item):
+        item_id = item["id"]
+        tracing.annotate(item=item_id)
+        item_dir = os.path.join(self.output_dir, item_id)
+        script_path = os.path.join(item_dir, "script.json")
+        formats = item["formats"] or self.formats
+        want_video = self.video if item["video"] is None else item["video"]
+
+        # Demande interrompue ou en échec lors d'un lancement précédent : ses étapes terminées sont reprises
+        previous = self.manifest["items"].get(item_id) or {}
+        stages = list(previous.get("stages") or []) if previous.get("prompt") == item["prompt"] else []
+        if "images" in stages and not os.path.exists(script_path):
+            stages = []
+        if stages:
+            print(f"🔁 [{item_id}] Reprise après l'étape {stages[-1]}")
+        entry = {
+            "prompt": item["prompt"],
+            "status": "running",
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "stages": stages,
+            "outputs": dict(previous.get("outputs") or {}) if stages else {},
+            "timings": dict(previous.get("timings") or {}) if stages else {},
+            "error": None,
+        }
+        for key in ("llm_cache", "export_timings", "video_ids", "avatar"):
+            if stages and key in previous:
+                entry[key] = previous[key]
+        timings = entry["timings"]
+        self._checkpoint(item_id, entry)
+
+        try:
+            if "images" in stages:
+                with open(script_path, 'r', encoding='utf-8') as f:
+                    script = json.load(f)
+            else:
+                generator = self._generator()
+
+                start = time.perf_counter()
+                with self.gemini_slots:
+                    script = generator.generate_training_script(item["prompt"], force_regenerate=self.force_regenerate,
+                                                                resolve_images=False)
+                timings["generation"] = round(time.perf_counter() - start, 3)
+                entry["llm_cache"] = generator.last_cache_status
+
+                start = time.perf_counter()
+                with self.image_slots:
+                    script = self.image_manager.validate_and_fix_image_urls(script)
+                timings["images"] = round(time.perf_counter() - start, 3)
+
+                os.makedirs(item_dir, exist_ok=True)
+                tmp_path = script_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(script, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, script_path)
+                entry["stages"].append("script")
+                self._checkpoint(item_id, entry, "images")
+
+            export_formats = list(formats)
+            if want_video and "json" not in export_formats:
+                export_formats.append("json")
+            exported = "exported" in stages and all(
+                entry["outputs"].get(fmt) and os.path.exists(entry["outputs"][fmt]) for fmt in export_formats)
+            if not exported:
+                start = time.perf_counter()
+                exports = export_script(script, export_formats, stem=item_id, folder=item_dir)
+                for fmt, result in exports.items():
+                    if not result["path"]:
+                        raise Exception(f"Export {fmt} échoué: {result['error']}")
+                    entry["outputs"][fmt] = result["path"]
+                timings["export"] = round(time.perf_counter() - start, 3)
+                entry["export_timings"] = {fmt: result["seconds"] for fmt, result in exports.items()}
+                self._checkpoint(item_id, entry, "exported")
+
+            if want_video:
+                video_path = os.path.join(item_dir, f"{item_id}.mp4")
+                if not ("downloaded" in stages and os.path.exists(video_path)):
+                    # Avatar et IDs vidéo enregistrés dès la soumission : une relance suit le même rendu
+                    # au lieu d'en payer un nouveau
+                    entry.setdefault("avatar", random.choice(AVATAR_IDS))
+
+                    def submitted(video_ids):
+                        entry["video_ids"] = video_ids
+                        self._checkpoint(item_id, entry, "submitted" if all(video_ids) else None)
+
+                    start = time.perf_counter()
+                    # Le rendu local occupe tous les cœurs : il partage la même limite que Synthesia
+                    with self.synthesia_slots:
+                        video = create_video_from_script(entry["outputs"]["json"], backend=self.video_backend,
+                                                         video_ids=entry.get("video_ids"), on_submit=submitted,
+                                                         avatar=entry["avatar"])
+                    timings["video"] = round(time.perf_counter() - start, 3)
+
+                    if video and video.endswith(".mp4"):
+                        shutil.move(video, video_path)
+                        entry["outputs"]["video"] = video_path
+                        self._checkpoint(item_id, entry, "downloaded")
+                    elif video:
+                        entry["outputs"]["video_url"] = video
+                    else:
+                        raise Exception("La création vidéo a échoué")
+
+                if "downloaded" in entry["stages"] and "subtitled" not in stages:
+                    start = time.perf_counter()
+                    entry["outputs"]["video_subtitled"] = add_subtitles_to_video(
+                        video_path, script, output_path=os.path.join(item_dir, f"{item_id}_sous_titres.mp4"))
+                    timings["subtitles"] = round(time.perf_counter() - start, 3)
+                    self._checkpoint(item_id, entry, "subtitled")
+
+            entry["status"] = "done"
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+            print(f"❌ [{item_id}] {e}")
+
+        entry["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        entry["timings"]["total"] = round(sum(value for key, value in timings.items() if key != "total"), 3)
+        self._record(item_id, entry)
+        return entry
+
+    def run(self, items):
+        todo = []
+        for item in items:
+            previous = self.manifest["items"].get(item["id"])
+            if previous and previous.get("status") == "done":
+                print(f"⏭️ [{item['id']}] Déjà traité, ignoré")
+                continue
+            todo.append(item)
+
+        print(f"🚀 {len(todo)} demandes à traiter ({len(items) - len(todo)} déjà terminées), "
+              f"{self.workers} workers")
+        start = time.perf_counter()
+        language_detection.warm_up_in_background()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.process, todo))
+
+        done = sum(1 for entry in results if entry["status"] == "done")
+        print(f"📊 {done}/{len(todo)} demandes réussies en {time.perf_counter() - start:.1f}s")
+        print(f"📒 Manifeste: {self.manifest_path}")
+        if tracing.is_enabled():
+            tracing.print_summary()
+            tracing.save(os.path.join(self.output_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération de formations en lot, sans interaction")
+    parser.add_argument("input", help="Fichier de demandes (.jsonl ou .csv avec une colonne prompt)")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--formats", default="json",
+                        help=f"Formats séparés par des virgules parmi {available_formats()}, ou all")
+    parser.add_argument("--video", action="store_true", help="Créer aussi la vidéo")
+    parser.add_argument("--video-backend", choices=["synthesia", "local"],
+                        help="Moteur de rendu vidéo (défaut: VIDEO_BACKEND ou synthesia)")
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES,
+                        help="outline : plan puis scènes rédigées en parallèle (défaut: GEMINI_GENERATION_MODE ou single)")
+    parser.add_argument("--gemini-concurrency", type=int, default=2)
+    parser.add_argument("--image-concurrency", type=int, default=2)
+    parser.add_argument("--synthesia-concurrency", type=int, default=1)
+    parser.add_argument("--force-regenerate", action="store_true", help="Ignorer le cache LLM")
+    parser.add_argument("--trace", action="store_true", help="Enregistrer une trace Chrome du lot")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+
+    formats = available_formats() if args.formats == "all" else [fmt.strip() for fmt in args.formats.split(",")]
+    runner = BatchRunner(
+        output_dir=args.output_dir,
+        workers=args.workers,
+        gemini_concurrency=args.gemini_concurrency,
+        image_concurrency=args.image_concurrency,
+        synthesia_concurrency=args.synthesia_concurrency,
+        formats=formats,
+        video=args.video,
+        force_regenerate=args.force_regenerate,
+        video_backend=args.video_backend,
+        generation_mode=args.generation_mode,
+    )
+    runner.run(load_requests(args.input))
+
+
+if __name__ == "__main__":
+    main()
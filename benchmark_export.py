@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+
+import exporters
+
+VOIX_OFF = ("Dans cette scène, nous détaillons les notions clés du module avec des exemples concrets, "
+            "des cas pratiques et des conseils de mise en oeuvre pour les équipes. ") * 6
+
+
+def make_script(scene_count):
+    """Script synthétique de scene_count scènes, proche de ce que produit Gemini"""
+    return {
+        "titre_formation": f"Compilation de {scene_count} scènes",
+        "description": "Script synthétique pour le benchmark des exports",
+        "objectifs": ["Objectif 1", "Objectif 2", "Objectif 3", "Objectif 4"],
+        "scenes": [
+            {
+                "numero": i,
+                "titre": f"Scène de démonstration numéro {i}",
+                "voix_off": VOIX_OFF,
+                "elements_visuels": f"https://images.pexels.com/photos/{1000 + i}/pexels-photo-{1000 + i}.jpeg",
+                "points_cles": ["Point clé 1", "Point clé 2", "Point clé 3"],
+            }
+            for i in range(1, scene_count + 1)
+        ],
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(scene_count, fmt, volumes, queue):
+    # Les URLs d'images du script synthétique ne sont pas téléchargées : seule l'écriture est mesurée
+    os.environ["ASSET_STORE"] = "0"
+    try:
+        script_data = make_script(scene_count)
+        baseline = peak_rss_mb()
+        with tempfile.TemporaryDirectory() as folder:
+            # Point d'entrée public : le benchmark passe par le même chemin que le générateur
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = exporters.export_script(script_data, [fmt], stem="bench", folder=folder,
+                                                  volumes=volumes)[fmt]
+            seconds = time.perf_counter() - start
+        if not result["path"]:
+            raise Exception(f"Export {fmt} échoué: {result['error']}")
+        queue.put((seconds, peak_rss_mb(), baseline, len(result["volumes"])))
+    except Exception as e:
+        queue.put(e)
+
+
+def measure(scene_count, fmt, volumes):
+    """Mesure dans un processus neuf pour que le pic de mémoire ne dépende pas des mesures précédentes"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(scene_count, fmt, volumes, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark temps / mémoire des exports PDF et PPT")
+    parser.add_argument("--sizes", default="10,100,1000", help="Nombres de scènes séparés par des virgules")
+    parser.add_argument("--formats", default="pdf,ppt")
+    parser.add_argument("--modes", default="standard,volumes",
+                        help="standard (un fichier) et/ou volumes (EXPORT_VOLUMES=1)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    formats = [fmt.strip() for fmt in args.formats.split(",")]
+    modes = [mode.strip() for mode in args.modes.split(",")]
+
+    print(f"📏 Volumes de {exporters.VOLUME_SIZE} scènes en mode volumes")
+    print(f"{'scènes':>7} | {'format':<6} | {'mode':<8} | {'temps (s)':>9} | {'pic RSS (Mo)':>12} | "
+          f"{'dont export':>11} | {'fichiers':>8}")
+    print("-" * 80)
+    for size in sizes:
+        for fmt in formats:
+            for mode in modes:
+                seconds, peak, baseline, files = measure(size, fmt, mode == "volumes")
+                print(f"{size:>7} | {fmt:<6} | {mode:<8} | {seconds:>9.2f} | "
+                      f"{peak:>12.1f} | {peak - baseline:>11.1f} | {files:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import time
+import random
+import argparse
+
+from keyword_index import KeywordIndex
+
+WORDS = ["donnees", "reseau", "modele", "apprentissage", "analyse", "securite", "cloud", "gestion",
+         "projet", "client", "vente", "marketing", "finance", "risque", "qualite", "production"]
+
+
+def make_vocabulary(size, rng):
+    return {f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}": f"search term {i}" for i in range(size)}
+
+
+def linear_lookup(vocabulary, title):
+    """Ancienne méthode : premier mot-clé contenu dans le titre"""
+    title_lower = title.lower()
+    for keyword, value in vocabulary.items():
+        if keyword in title_lower:
+            return value
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recherche de mots-clés : parcours linéaire contre index compilé")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Tailles de vocabulaire")
+    parser.add_argument("--titles", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'mots-clés':>9} | {'construction (ms)':>17} | {'linéaire (µs/titre)':>19} | {'index (µs/titre)':>16}")
+    print("-" * 72)
+    for size in [int(value) for value in args.sizes.split(",")]:
+        vocabulary = make_vocabulary(size, rng)
+        keywords = list(vocabulary)
+        titles = [f"Module {i} : {rng.choice(WORDS)} et {rng.choice(keywords)}" for i in range(args.titles)]
+
+        start = time.perf_counter()
+        index = KeywordIndex(vocabulary)
+        index.best("")
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for title in titles:
+            linear_lookup(vocabulary, title)
+        linear_us = (time.perf_counter() - start) / len(titles) * 1e6
+
+        start = time.perf_counter()
+        for title in titles:
+            index.best(title)
+        index_us = (time.perf_counter() - start) / len(titles) * 1e6
+
+        print(f"{size:>9} | {build_ms:>17.1f} | {linear_us:>19.1f} | {index_us:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+from benchmark_export import peak_rss_mb
+from fake_servers import FakePexelsServer, FakeUnsplashServer, FakeSynthesiaServer, FakeGeminiModel
+
+STAGES = ["generation", "images", "export", "video", "subtitles", "total"]
+
+
+def percentile(values, fraction):
+    """Percentile au rang le plus proche (values non vide)"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _run(config, queue):
+    """Un niveau de concurrence, dans un processus neuf : faux serveurs, lot de formations, mesures"""
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    stdout = sys.stdout
+    try:
+        os.chdir(work_dir)
+        if not config["verbose"]:
+            sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+        image_options = {"latency": config["latency"], "error_rate": config["error_rate"],
+                         "miss_rate": config["miss_rate"]}
+        with FakePexelsServer(**image_options) as pexels, FakeUnsplashServer(**image_options) as unsplash, \
+                FakeSynthesiaServer(queue_seconds=config["queue_seconds"], render_seconds=config["render_seconds"],
+                                    failure_rate=config["render_failure_rate"], latency=config["latency"],
+                                    video_size=config["video_size"], video_file=config["video_file"],
+                                    webhook_drop_rate=config["webhook_drop_rate"]) as synthesia:
+            # Les modules lisent leur configuration à l'import : l'environnement est prêt avant
+            os.environ.update({
+                "GEMINI_API_KEY": "bench", "LLM_CACHE": "0", "IMAGE_CACHE": "0",
+                "PEXELS_API_KEY": "bench", "PEXELS_API_URL": pexels.api_url,
+                "UNSPLASH_ACCESS_KEY": "bench", "UNSPLASH_API_URL": unsplash.api_url,
+                "SYNTHESIA_API_KEY": "bench", "SYNTHESIA_API_URL": synthesia.api_url,
+                "SYNTHESIA_POLL_INTERVAL": str(config["poll_interval"]),
+                "VIDEO_BACKEND": "synthesia",
+                "SYNTHESIA_CHUNK_SCENES": str(config["chunk_scenes"]),
+                "SYNTHESIA_MIN_POLL_INTERVAL": str(config["poll_interval"]),
+                "SYNTHESIA_WEBHOOK": "1" if config["webhooks"] else "0",
+                "SYNTHESIA_WEBHOOK_PORT": "0",
+                "SYNTHESIA_WEBHOOK_DEADLINE": str(config["webhook_deadline"]),
+                "SYNTHESIA_FALLBACK_POLL_INTERVAL": str(config["poll_interval"]),
+            })
+            from batch import BatchRunner
+
+            gemini = FakeGeminiModel(seconds=config["gemini_seconds"], scenes=config["scenes"],
+                                     error_rate=config["gemini_error_rate"],
+                                     broken_scene_rate=config["broken_scene_rate"])
+
+            class BenchmarkRunner(BatchRunner):
+                def _generator(self):
+                    generator = super()._generator()
+                    generator._model = gemini
+                    return generator
+
+            concurrency = config["concurrency"]
+            runner = BenchmarkRunner(
+                output_dir=os.path.join(work_dir, "batch_output"),
+                workers=concurrency,
+                gemini_concurrency=config["gemini_concurrency"] or concurrency,
+                image_concurrency=config["image_concurrency"] or concurrency,
+                synthesia_concurrency=config["synthesia_concurrency"] or concurrency,
+                formats=config["formats"],
+                video=config["video"],
+                generation_mode=config["generation_mode"],
+            )
+            # Les images de secours pointent aussi vers le faux serveur : aucun appel réseau réel
+            runner.image_manager.fallback_urls = {
+                category: f"{pexels.url}/photos/{category}.jpeg" for category in runner.image_manager.fallback_urls
+            }
+
+            items = [
+                {"id": f"formation_{i:03d}", "prompt": f"Formation sur la gestion de projet, module {i}",
+                 "formats": None, "video": None}
+                for i in range(config["courses"])
+            ]
+            start = time.perf_counter()
+            entries = runner.run(items)
+            wall = time.perf_counter() - start
+
+            stages = {}
+            for entry in entries:
+                if entry["status"] != "done":
+                    continue
+                for stage, seconds in entry["timings"].items():
+                    stages.setdefault(stage, []).append(seconds)
+
+            queue.put({
+                "concurrency": concurrency,
+                "wall": wall,
+                "done": sum(1 for entry in entries if entry["status"] == "done"),
+                "failed": sum(1 for entry in entries if entry["status"] != "done"),
+                "errors": sorted({entry["error"] for entry in entries if entry["error"]}),
+                "stages": stages,
+                "peak_rss_mb": peak_rss_mb(),
+                "requests": {"gemini": gemini.call_count, "pexels": pexels.search_count,
+                             "unsplash": unsplash.search_count, "synthesia_polls": synthesia.poll_count,
+                             "synthesia_callbacks": synthesia.callback_count},
+            })
+    except Exception as e:
+        queue.put(e)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def measure(config):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(config, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def print_result(result):
+    courses_per_hour = result["done"] / result["wall"] * 3600 if result["wall"] else 0
+    print(f"\n⚙️ Concurrence {result['concurrency']}: {result['done']} réussies, {result['failed']} échouées "
+          f"en {result['wall']:.1f}s -> {courses_per_hour:.0f} formations/heure, "
+          f"pic RSS {result['peak_rss_mb']:.0f} Mo")
+    print(f"   {'étape':<11} | {'p50 (s)':>8} | {'p95 (s)':>8}")
+    for stage in STAGES:
+        values = result["stages"].get(stage)
+        if values:
+            print(f"   {stage:<11} | {percentile(values, 0.5):>8.2f} | {percentile(values, 0.95):>8.2f}")
+    print("   appels: " + ", ".join(f"{name} {count}" for name, count in result["requests"].items()))
+    for error in result["errors"]:
+        print(f"   ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout avec faux Gemini, Pexels, "
+                                                 "Unsplash et Synthesia locaux")
+    parser.add_argument("--courses", type=int, default=20, help="Formations par niveau de concurrence")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Nombres de workers à comparer")
+    parser.add_argument("--scenes", type=int, default=10)
+    parser.add_argument("--formats", default="json,pdf")
+    parser.add_argument("--no-video", action="store_true", help="Ne pas passer par le faux Synthesia")
+    parser.add_argument("--gemini-seconds", type=float, default=3.0, help="Durée d'une génération Gemini")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--generation-mode", choices=["single", "outline"], default="single",
+                        help="Script en une réponse ou plan puis scènes en parallèle")
+    parser.add_argument("--broken-scene-rate", type=float, default=0.0,
+                        help="Proportion de scènes renvoyées incomplètes par le faux Gemini")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence des faux serveurs HTTP (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Taux de réponses 503 des API d'images")
+    parser.add_argument("--miss-rate", type=float, default=0.0, help="Taux de recherches d'images sans résultat")
+    parser.add_argument("--queue-seconds", type=float, default=0.5)
+    parser.add_argument("--render-seconds", type=float, default=3.0, help="Durée d'un rendu Synthesia")
+    parser.add_argument("--render-failure-rate", type=float, default=0.0)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--video-size", type=int, default=1024 * 1024)
+    parser.add_argument("--chunk-scenes", type=int, default=0,
+                        help="Scènes par rendu Synthesia (0 = une seule vidéo par formation)")
+    parser.add_argument("--video-file", help="MP4 servi par le faux Synthesia (défaut: une mire générée "
+                                             "si --chunk-scenes, sinon des octets factices)")
+    parser.add_argument("--gemini-concurrency", type=int, help="Limite Gemini (défaut: la concurrence)")
+    parser.add_argument("--image-concurrency", type=int, help="Limite images (défaut: la concurrence)")
+    parser.add_argument("--synthesia-concurrency", type=int, help="Limite Synthesia (défaut: la concurrence)")
+    parser.add_argument("--webhooks", action="store_true",
+                        help="Suivre les rendus par notifications (webhook local) plutôt que par polling")
+    parser.add_argument("--webhook-deadline", type=float, default=10.0,
+                        help="Délai avant de repasser au polling faute de notification (s)")
+    parser.add_argument("--webhook-drop-rate", type=float, default=0.0,
+                        help="Proportion de notifications perdues par le faux Synthesia")
+    parser.add_argument("--verbose", action="store_true", help="Afficher la sortie du pipeline")
+    args = parser.parse_args()
+
+    video_file = args.video_file
+    if args.chunk_scenes and not video_file:
+        # L'assemblage des parties exige de vrais MP4
+        from benchmark_subtitles import make_test_video
+        video_file = make_test_video(os.path.join(tempfile.mkdtemp(prefix="bench_video_"), "partie.mp4"),
+                                     duration=4, size="320x240", fps=24)
+
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        result = measure({
+            "concurrency": concurrency,
+            "courses": args.courses,
+            "scenes": args.scenes,
+            "formats": [fmt.strip() for fmt in args.formats.split(",")],
+            "video": not args.no_video,
+            "gemini_seconds": args.gemini_seconds,
+            "gemini_error_rate": args.gemini_error_rate,
+            "generation_mode": args.generation_mode,
+            "broken_scene_rate": args.broken_scene_rate,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "miss_rate": args.miss_rate,
+            "queue_seconds": args.queue_seconds,
+            "render_seconds": args.render_seconds,
+            "render_failure_rate": args.render_failure_rate,
+            "poll_interval": args.poll_interval,
+            "video_size": args.video_size,
+            "video_file": video_file,
+            "chunk_scenes": args.chunk_scenes,
+            "webhooks": args.webhooks,
+            "webhook_deadline": args.webhook_deadline,
+            "webhook_drop_rate": args.webhook_drop_rate,
+            "gemini_concurrency": args.gemini_concurrency,
+            "image_concurrency": args.image_concurrency,
+            "synthesia_concurrency": args.synthesia_concurrency,
+            "verbose": args.verbose,
+        })
+        print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import sys
+import argparse
+import statistics
+import subprocess
+
+# SDK lourds qui ne doivent être chargés que par l'étape qui s'en sert
+HEAVY_MODULES = ["google.generativeai", "fpdf", "pptx", "langdetect", "requests", "moviepy", "numpy", "PIL"]
+
+
+def import_profile(module):
+    """Importe module dans un interpréteur neuf avec -X importtime ; renvoie {module: cumul en µs}"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"❌ Import de {module} impossible:\n{result.stderr.strip()[-1000:]}")
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage des points d'entrée (python -X importtime)")
+    parser.add_argument("modules", nargs="*", default=["main", "batch"])
+    parser.add_argument("--runs", type=int, default=5, help="Mesures par module (la médiane est retenue)")
+    parser.add_argument("--budget-ms", type=float, default=250, help="Temps d'import maximal toléré")
+    parser.add_argument("--top", type=int, default=10, help="Modules les plus coûteux à afficher")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        profiles = [import_profile(module) for _ in range(max(1, args.runs))]
+        total_ms = statistics.median(profile[module] for profile in profiles) / 1000
+        last = profiles[-1]
+
+        print(f"\n⏱️ import {module}: {total_ms:.1f} ms (médiane de {len(profiles)}, budget {args.budget_ms:.0f} ms)")
+        for name, cumulative in sorted(last.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+            print(f"   {cumulative / 1000:>8.1f} ms  {name}")
+
+        heavy = sorted({name.split(".")[0] if name.split(".")[0] != "google" else name
+                        for name in last
+                        for heavy_module in HEAVY_MODULES
+                        if name == heavy_module or name.startswith(heavy_module + ".")})
+        if heavy:
+            failures.append(f"{module} importe au démarrage: {', '.join(heavy)}")
+        if total_ms > args.budget_ms:
+            failures.append(f"{module} dépasse le budget ({total_ms:.1f} ms > {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\n❌ Régression du démarrage:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Démarrage dans le budget, aucun SDK lourd chargé à l'import")
+
+
+if __name__ == "__main__":
+    main()
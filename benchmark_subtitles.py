@@ -0,0 +1,73 @@
+import os
+import time
+import argparse
+import tempfile
+
+from ffmpeg_utils import run_ffmpeg, probe_duration
+from video_subtitles import add_subtitles_with_ffmpeg, add_subtitles_parallel, create_srt_file
+
+
+def make_test_video(path, duration, size, fps):
+    """Vidéo synthétique (mire animée + bip) avec une image clé toutes les 2 secondes"""
+    run_ffmpeg([
+        '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={fps}",
+        '-f', 'lavfi', '-i', "sine=frequency=440:sample_rate=44100",
+        '-t', str(duration), '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(fps * 2),
+        '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', path,
+    ])
+    return path
+
+
+def make_script(duration):
+    """Une scène de 10 secondes de voix off par tranche de 10 secondes de vidéo"""
+    return {
+        "titre_formation": "Benchmark sous-titres",
+        "scenes": [
+            {"numero": i + 1, "titre": f"Scène {i + 1}",
+             "voix_off": f"Sous-titre de la scène {i + 1} pour mesurer le coût de l'incrustation."}
+            for i in range(int(duration // 10))
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrustation des sous-titres : un processus contre N workers")
+    parser.add_argument("--duration", type=int, default=1800, help="Durée de la vidéo de test (s)")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--workers", default=f"2,4,{os.cpu_count() or 1}",
+                        help="Nombres de workers à comparer au processus unique")
+    parser.add_argument("--video", help="Réutiliser une vidéo existante au lieu d'en générer une")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        video_path = args.video
+        if not video_path:
+            print(f"🎬 Génération d'une vidéo de test de {args.duration}s ({args.size})...")
+            start = time.perf_counter()
+            video_path = make_test_video(os.path.join(folder, "test.mp4"), args.duration, args.size, args.fps)
+            print(f"   prête en {time.perf_counter() - start:.1f}s")
+        duration = probe_duration(video_path) or args.duration
+        script_data = make_script(duration)
+
+        start = time.perf_counter()
+        srt_path = create_srt_file(script_data, os.path.join(folder, "test.srt"))
+        if not add_subtitles_with_ffmpeg(video_path, srt_path, os.path.join(folder, "single.mp4")):
+            raise Exception("❌ Incrustation en un seul processus échouée")
+        single = time.perf_counter() - start
+
+        print(f"{'workers':>8} | {'durée (s)':>9} | {'accélération':>12}")
+        print("-" * 36)
+        print(f"{'1 (seul)':>8} | {single:>9.1f} | {1.0:>11.2f}x")
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            output_path = os.path.join(folder, f"parallel_{workers}.mp4")
+            start = time.perf_counter()
+            if not add_subtitles_parallel(video_path, script_data, output_path, workers=workers):
+                raise Exception(f"❌ Incrustation parallèle échouée ({workers} workers)")
+            seconds = time.perf_counter() - start
+            drift = abs((probe_duration(output_path) or 0) - duration)
+            print(f"{workers:>8} | {seconds:>9.1f} | {single / seconds:>11.2f}x   (écart de durée {drift:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join("data", "cache.sqlite3")
+
+
+class CacheStore:
+    """Cache clé/valeur persistant (SQLite) avec expiration TTL et éviction LRU"""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or os.getenv("CACHE_DB_PATH", DEFAULT_CACHE_PATH)
+        if max_entries is None:
+            max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+        self.max_entries = max_entries
+
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+
+    def lookup(self, namespace, key):
+        """Renvoie (trouvé, valeur) ; une valeur None est un résultat négatif mis en cache"""
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return False, None
+            if row[1] <= now:
+                self.conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                return False, None
+            self.conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+        return True, json.loads(row[0])
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), now, now + ttl, now)
+            )
+            self._evict()
+
+    def get_or_compute(self, namespace, key, compute, ttl, negative_ttl=None):
+        """Renvoie la valeur en cache ou la calcule ; les résultats vides (None, False) expirent plus vite.
+
+        Si compute lève une exception (erreur réseau, quota...), rien n'est mis en cache."""
+        found, value = self.lookup(namespace, key)
+        if found:
+            return value
+        value = compute()
+        if not value and negative_ttl is not None:
+            ttl = negative_ttl
+        self.set(namespace, key, value, ttl)
+        return value
+
+    def _evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la limite"""
+        self.conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        if self.max_entries <= 0:
+            return
+        count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM entries WHERE rowid IN "
+                "(SELECT rowid FROM entries ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def purge(self, namespace=None, expired_only=False):
+        """Vide le cache (ou un namespace) et renvoie le nombre d'entrées supprimées"""
+        query = "DELETE FROM entries WHERE 1 = 1"
+        params = []
+        if namespace:
+            query += " AND namespace = ?"
+            params.append(namespace)
+        if expired_only:
+            query += " AND expires_at <= ?"
+            params.append(time.time())
+        with self.lock, self.conn:
+            return self.conn.execute(query, params).rowcount
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT namespace, COUNT(*), SUM(value IN ('null', 'false')), SUM(expires_at <= ?) "
+                "FROM entries GROUP BY namespace ORDER BY namespace",
+                (now,)
+            ).fetchall()
+        return [
+            {"namespace": ns, "entries": total, "negative": negative or 0, "expired": expired or 0}
+            for ns, total, negative, expired in rows
+        ]
+
+    def entries(self, namespace=None, limit=50):
+        query = "SELECT namespace, key, value, expires_at, last_access FROM entries"
+        params = []
+        if namespace:
+            query += " WHERE namespace = ?"
+            params.append(namespace)
+        query += " ORDER BY last_access DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspection et purge du cache local")
+    parser.add_argument("--db", default=None, help=f"Chemin de la base (défaut: {DEFAULT_CACHE_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Nombre d'entrées par namespace")
+
+    list_parser = sub.add_parser("list", help="Entrées les plus récemment utilisées")
+    list_parser.add_argument("namespace", nargs="?")
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    purge_parser = sub.add_parser("purge", help="Supprimer des entrées")
+    purge_parser.add_argument("namespace", nargs="?")
+    purge_parser.add_argument("--expired", action="store_true", help="Uniquement les entrées expirées")
+
+    args = parser.parse_args()
+    store = CacheStore(args.db)
+
+    if args.command == "stats":
+        stats = store.stats()
+        if not stats:
+            print("📭 Cache vide")
+        for row in stats:
+            print(f"📦 {row['namespace']}: {row['entries']} entrées "
+                  f"({row['negative']} négatives, {row['expired']} expirées)")
+    elif args.command == "list":
+        now = time.time()
+        for namespace, key, value, expires_at, _ in store.entries(args.namespace, args.limit):
+            remaining = int(expires_at - now)
+            print(f"[{namespace}] {key} -> {value[:100]} (expire dans {remaining}s)")
+    elif args.command == "purge":
+        removed = store.purge(args.namespace, expired_only=args.expired)
+        print(f"🧹 {removed} entrées supprimées")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
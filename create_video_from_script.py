@@ -1,15 +1,22 @@
 import os
 import json
 import time
-import requests
+import http_client
+import tracing
+from language_detection import detect_language
 from dotenv import load_dotenv
 import random
 
 
 
 load_dotenv()
-API_URL = "https://api.synthesia.io/v2/videos"
+API_URL = os.getenv("SYNTHESIA_API_URL", "https://api.synthesia.io/v2/videos")
 API_KEY = os.getenv("SYNTHESIA_API_KEY")
+POLL_INTERVAL = float(os.getenv("SYNTHESIA_POLL_INTERVAL", "10"))
+# Durée maximale d'attente d'un rendu (notification puis polling compris)
+RENDER_TIMEOUT = float(os.getenv("SYNTHESIA_RENDER_TIMEOUT", "1800"))
+# "synthesia" (API payante) ou "local" (rendu moviepy + ffmpeg sur la machine)
+VIDEO_BACKEND = os.getenv("VIDEO_BACKEND", "synthesia")
 
 AVATAR_IDS = [
     "anna_costume1_cameraA",
@@ -17,31 +24,11 @@ AVATAR_IDS = [
     "mike_costume1_cameraA"
 ]
 
-# Choisir un avatar au hasard pour cette vidéo
-selected_avatar = random.choice(AVATAR_IDS)
-print(f"🎭 Avatar sélectionné aléatoirement : {selected_avatar}")
-
-def detect_language_and_create_intro(titre_formation, objectifs):
-    """Détecte la langue et crée l'introduction appropriée"""
-    
-    # ✅ Détecter la langue en analysant le titre et les objectifs
-    sample_text = titre_formation + " " + " ".join(objectifs[:2]) if objectifs else titre_formation
-    
-    # Simple détection basée sur des mots-clés
-    french_keywords = ['formation', 'cours', 'apprentissage', 'développement', 'compétences', 'savoir']
-    english_keywords = ['training', 'course', 'learning', 'development', 'skills', 'knowledge', 'understanding']
-    
-    sample_lower = sample_text.lower()
-    
-    # Compter les occurrences de mots-clés
-    french_score = sum(1 for word in french_keywords if word in sample_lower)
-    english_score = sum(1 for word in english_keywords if word in sample_lower)
-    
-    # Déterminer la langue
-    if english_score > french_score:
-        language = 'en'
-    else:
-        language = 'fr'  # Français par défaut
+def detect_language_and_create_intro(titre_formation, objectifs, language=None):
+    """Crée l'introduction dans la langue du script (détectée seulement si le JSON ne la donne pas)"""
+    if not language:
+        sample_text = titre_formation + " " + " ".join(objectifs[:2]) if objectifs else titre_formation
+        language = detect_language(sample_text)
     
     # ✅ Templates d'introduction par langue
     templates = {
@@ -59,6 +46,9 @@ def detect_language_and_create_intro(titre_formation, objectifs):
         }
     }
     
+    # Les langues sans gabarit retombent sur le français
+    if language not in templates:
+        language = 'fr'
     template = templates[language]
     intro_text = template['greeting'].format(titre=titre_formation)
     
@@ -71,7 +61,19 @@ def detect_language_and_create_intro(titre_formation, objectifs):
     print(f"🌐 Langue détectée: {language.upper()}")
     return intro_text, language
 
-def create_video_from_script(json_file_path):
+@tracing.traced("video.create")
+def create_video_from_script(json_file_path, backend=None, video_ids=None, on_submit=None, avatar=None):
+    """Crée la vidéo du script ; video_ids reprend le suivi de rendus déjà soumis (sans resoumettre)
+    et on_submit reçoit la liste des IDs vidéo dès leur soumission, pour pouvoir reprendre plus tard.
+    avatar fixe l'avatar (à réutiliser lors d'une reprise pour que toutes les parties soient cohérentes)"""
+    if (backend or VIDEO_BACKEND) == "local":
+        from local_renderer import render_script_file
+        try:
+            return render_script_file(json_file_path)
+        except Exception as err:
+            print(f"💥 Erreur lors du rendu local: {err}")
+            return None
+
     if not API_KEY:
         raise ValueError("❌ SYNTHESIA_API_KEY manquante dans .env")
 
@@ -80,17 +82,89 @@ def create_video_from_script(json_file_path):
 
     with open(json_file_path, 'r', encoding='utf-8') as f:
         script_data = json.load(f)
+
+    payload = build_video_payload(script_data, avatar=avatar)
+    if payload is None:
+        return None
+    clips = payload["input"]
+
+    print("📡 Envoi de la requête à Synthesia...")
+    print(f"🔍 Nombre de clips: {len(clips)}")
+    points_utilisés = [len(clip.get('texts', [])) for clip in clips[1:]]  # Exclure l'intro
+    print(f"📋 Points clés par scène: {points_utilisés}")
+   
+    images_utilisees = [
+    clip['background'] if isinstance(clip.get('background'), str) and clip['background'].startswith("http") else "Aucune"
+    for clip in clips[1:]  # on saute l'intro
+]
+    
+    print(f"🖼️ Images utilisées dans les scènes :")
+    for i, img in enumerate(images_utilisees, start=1):
+        print(f"   - Scène {i}: {img}")
     
+    print(f"🔍 Sample clip format: {json.dumps(clips[0] if clips else {}, indent=2)}")
+
+    # Longue formation : plusieurs rendus en parallèle, assemblés ensuite sans réencodage
+    from synthesia_orchestrator import split_payload, render_in_chunks
+    payloads = split_payload(payload)
+    if len(payloads) > 1:
+        print(f"✂️ Formation découpée en {len(payloads)} rendus Synthesia")
+        try:
+            return render_in_chunks(payloads, video_ids=video_ids, on_submit=on_submit)
+        except Exception as err:
+            print(f"💥 Erreur lors du rendu par parties: {err}")
+            return None
     
+    try:
+        if video_ids:
+            video_id = video_ids[0]
+            print(f"🔁 Reprise du suivi de la vidéo {video_id}")
+            # Le rendu a pu se terminer pendant l'interruption : pas d'attente de notification
+            video_info = get_video_status(video_id)
+            if video_info.get('status') in ["complete", "failed"]:
+                return _finish_video(video_id, video_info)
+        else:
+            video_id = submit_video(payload)
+            if video_id and on_submit:
+                on_submit([video_id])
+        
+        if video_id:
+            print(f"✅ Vidéo créée avec succès ! ID: {video_id}")
+            download_url = wait_for_video_completion(video_id)
+            if download_url:
+                print(f"🎬 Vidéo prête ! Lien de téléchargement : {download_url}")
+                print(f"🌐 Ou consultez sur Synthesia : https://app.synthesia.io/video/{video_id}")
+                return download_url
+            else:
+                print(f"⏳ Vidéo en cours de génération. Consultez : https://app.synthesia.io/video/{video_id}")
+                return f"https://app.synthesia.io/video/{video_id}"
+        else:
+            return None
+            
+    except Exception as err:
+        print(f"💥 Erreur lors de la création: {err}")
+ 
+        return None
 
+def build_video_payload(script_data, avatar=None):
+    """Construit le payload Synthesia (intro + une séquence par scène) à partir du script"""
     clips = []
 
+    # Choisir un avatar au hasard pour cette vidéo, sauf s'il est imposé (reprise d'une formation)
+    if avatar:
+        selected_avatar = avatar
+        print(f"🎭 Avatar de la formation : {selected_avatar}")
+    else:
+        selected_avatar = random.choice(AVATAR_IDS)
+        print(f"🎭 Avatar sélectionné aléatoirement : {selected_avatar}")
+
     titre_formation = script_data.get("titre_formation", "Formation IA")
     objectifs = script_data.get("objectifs", [])
     
 
     # ✅ Utiliser la fonction de détection de langue au lieu du texte français codé en dur
-    intro_text, detected_language = detect_language_and_create_intro(titre_formation, objectifs)
+    intro_text, detected_language = detect_language_and_create_intro(titre_formation, objectifs,
+                                                                      script_data.get("langue"))
     intro_clip = {
         "scriptText": intro_text,
         "avatar": selected_avatar,
@@ -187,124 +261,132 @@ def create_video_from_script(json_file_path):
         "visibility": "private",
         "input": clips
     }
+    return payload
 
-    headers = {
+def _auth_headers(api_key=None):
+    return {
         "Content-Type": "application/json",
-         "Authorization": f"{API_KEY}" 
+        "Authorization": f"{api_key or API_KEY}"
     }
 
-    print("📡 Envoi de la requête à Synthesia...")
-    print(f"🔍 Nombre de clips: {len(clips)}")
-    points_utilisés = [len(clip.get('texts', [])) for clip in clips[1:]]  # Exclure l'intro
-    print(f"📋 Points clés par scène: {points_utilisés}")
-   
-    images_utilisees = [
-    clip['background'] if isinstance(clip.get('background'), str) and clip['background'].startswith("http") else "Aucune"
-    for clip in clips[1:]  # on saute l'intro
-]
-    
-    print(f"🖼️ Images utilisées dans les scènes :")
-    for i, img in enumerate(images_utilisees, start=1):
-        print(f"   - Scène {i}: {img}")
-    
-    print(f"🔍 Sample clip format: {json.dumps(clips[0] if clips else {}, indent=2)}")
-    
-    try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        
-        if response.status_code in [200, 201]:
-            video_data = response.json()
-            video_id = video_data.get("id")
-            print(f"✅ Vidéo créée avec succès ! ID: {video_id}")
-            download_url = wait_for_video_completion(video_id)
-            if download_url:
-                print(f"🎬 Vidéo prête ! Lien de téléchargement : {download_url}")
-                print(f"🌐 Ou consultez sur Synthesia : https://app.synthesia.io/video/{video_id}")
-                return download_url
-            else:
-                print(f"⏳ Vidéo en cours de génération. Consultez : https://app.synthesia.io/video/{video_id}")
-                return f"https://app.synthesia.io/video/{video_id}"
-            
-        else:
-            print(f"❌ Erreur HTTP: {response.status_code}")
-            print(f"📄 Réponse complète: {response.text}")
-            return None
-            
-    except Exception as err:
-        print(f"💥 Erreur lors de la création: {err}")
- 
-        return None
-def download_video_file(download_url, video_id):
+@tracing.traced("synthesia.submit")
+def submit_video(payload, api_url=None, api_key=None):
+    """Soumet un payload à Synthesia et renvoie l'ID de la vidéo (None si refusé)"""
+    from webhook_receiver import get_receiver
+    # Le webhook doit être enregistré avant la soumission pour recevoir la fin de ce rendu
+    get_receiver()
+    response = http_client.post(api_url or API_URL, headers=_auth_headers(api_key), json=payload)
+    if response.status_code in [200, 201]:
+        return response.json().get("id")
+
+    print(f"❌ Erreur HTTP: {response.status_code}")
+    print(f"📄 Réponse complète: {response.text}")
+    return None
+
+def get_video_status(video_id, api_url=None, api_key=None):
+    """Renvoie les informations de statut d'une vidéo Synthesia"""
+    response = http_client.get(f"{api_url or API_URL}/{video_id}", headers=_auth_headers(api_key))
+    if response.status_code != 200:
+        error = Exception(f"Erreur lors de la vérification: {response.status_code}")
+        # Permet à l'appelant de distinguer une erreur définitive (401, 404...) d'une erreur transitoire
+        error.status_code = response.status_code
+        raise error
+    return response.json()
+
+@tracing.traced("video.download")
+def download_video_file(download_url, video_id, folder=None):
     """Télécharge la vidéo depuis l'URL fournie par Synthesia"""
+    from downloader import download_file
     try:
         print("📥 Téléchargement de la vidéo en cours...")
-        response = requests.get(download_url, stream=True)
-        
-        if response.status_code == 200:
-            filename = f"video_{video_id}.mp4"
-            filepath = os.path.join(os.getcwd(), filename)
-            
-            # Télécharger avec une barre de progression basique
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            print(f"\r📥 Téléchargement: {progress:.1f}%", end="", flush=True)
-            
-            print(f"\n✅ Vidéo téléchargée: {filepath}")
-            return filepath
-        else:
-            print(f"❌ Erreur de téléchargement: {response.status_code}")
-            return None
+        filename = f"video_{video_id}.mp4"
+        filepath = os.path.join(folder or os.getcwd(), filename)
+
+        # Fichier .part reprenable, segments parallèles pour les grosses vidéos
+        download_file(download_url, filepath)
+        tracing.annotate(bytes=os.path.getsize(filepath))
+
+        print(f"✅ Vidéo téléchargée: {filepath}")
+        return filepath
             
     except Exception as e:
         print(f"💥 Erreur lors du téléchargement: {e}")
         return None  
+def _finish_video(video_id, video_info):
+    """Vidéo terminée (complete ou failed) : téléchargement local ou None"""
+    if video_info.get('status') == "failed":
+        print("❌ La génération de la vidéo a échoué")
+        return None
+    download_url = video_info.get('download')
+    if download_url:
+        # Télécharger la vidéo localement
+        local_video_path = download_video_file(download_url, video_id)
+        return local_video_path
+    else:
+        print("⚠️ Vidéo complète mais pas de lien de téléchargement")
+        return None
+
+@tracing.traced("synthesia.wait")
 def wait_for_video_completion(video_id):
-    """Attend que la vidéo soit prête et télécharge le fichier"""
+    """Attend que la vidéo soit prête et télécharge le fichier.
+
+    Avec un webhook configuré, la notification de Synthesia déclenche le téléchargement dès la fin
+    du rendu ; le polling (lent) ne sert plus que de secours si elle n'arrive pas à temps."""
+    from webhook_receiver import get_receiver, WEBHOOK_DEADLINE, FALLBACK_POLL_INTERVAL
+
     headers = {
         "Authorization": f"{API_KEY}",
         "Content-Type": "application/json"
     }
     
-    status_url = f"https://api.synthesia.io/v2/videos/{video_id}"
-    max_attempts = 180 # Maximum 30 minutes d'attente
+    status_url = f"{API_URL}/{video_id}"
+    # Attente bornée par la durée totale (RENDER_TIMEOUT, 30 minutes par défaut), pas par un nombre de polls
+    deadline = time.monotonic() + RENDER_TIMEOUT
+    poll_interval = POLL_INTERVAL
+
+    receiver = get_receiver()
+    if receiver:
+        webhook_wait = min(WEBHOOK_DEADLINE, RENDER_TIMEOUT)
+        print(f"📬 Attente de la notification Synthesia (au plus {webhook_wait:.0f}s)...")
+        video_info = receiver.wait(video_id, webhook_wait)
+        if video_info:
+            tracing.annotate(polls=0, status=video_info.get('status'), webhook=True)
+            return _finish_video(video_id, video_info)
+        print("⏰ Aucune notification reçue, vérification du statut par polling")
+        poll_interval = max(POLL_INTERVAL, FALLBACK_POLL_INTERVAL)
     
     print("⏳ Vérification du statut de la vidéo...")
     
-    for attempt in range(max_attempts):
+    attempt = 0
+    while True:
+        attempt += 1
         try:
-            response = requests.get(status_url, headers=headers)
+            response = http_client.get(status_url, headers=headers)
             
             if response.status_code == 200:
                 video_info = response.json()
                 status = video_info.get('status')
                 
                 print(f"📊 Statut: {status}")
+                tracing.annotate(polls=attempt, status=status)
                 
-                if status == "complete":
-                    download_url = video_info.get('download')
-                    if download_url:
-                        # Télécharger la vidéo localement
-                        local_video_path = download_video_file(download_url, video_id)
-                        return local_video_path
-                    else:
-                        print("⚠️ Vidéo complète mais pas de lien de téléchargement")
-                        return None
-                        
-                elif status == "failed":
-                    print("❌ La génération de la vidéo a échoué")
-                    return None
+                if status in ["complete", "failed"]:
+                    return _finish_video(video_id, video_info)
                     
-                elif status in ["in_progress", "queued"]:
-                    print(f"⏳ Génération en cours... (tentative {attempt + 1}/{max_attempts})")
-                    time.sleep(10)  # Attendre 10 secondes
+                else:
+                    # in_progress, queued (ou statut inconnu) : nouvelle vérification plus tard
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    print(f"⏳ Génération en cours... (vérification {attempt}, encore {remaining:.0f}s au plus)")
+                    if receiver:
+                        # Une notification tardive interrompt l'attente
+                        video_info = receiver.wait(video_id, min(poll_interval, remaining))
+                        if video_info:
+                            tracing.annotate(webhook=True)
+                            return _finish_video(video_id, video_info)
+                    else:
+                        time.sleep(min(poll_interval, remaining))
                     continue
                     
             else:
@@ -315,5 +397,5 @@ def wait_for_video_completion(video_id):
             print(f"💥 Erreur lors de la vérification: {e}")
             return None
     
-    print("⏰ Timeout: La vidéo prend plus de temps que prévu à être générée")
+    print(f"⏰ Timeout: La vidéo n'est pas prête après {RENDER_TIMEOUT:.0f}s")
     return None
\ No newline at end of file
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import http_client
+
+CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", "4"))
+PARALLEL_MIN_SIZE = int(os.getenv("DOWNLOAD_PARALLEL_MIN_SIZE", str(64 * 1024 * 1024)))
+MAX_RESUMES = int(os.getenv("DOWNLOAD_MAX_RESUMES", "5"))
+# Octets écrits (et synchronisés sur disque) entre deux sauvegardes de l'état de reprise
+CHECKPOINT_BYTES = int(os.getenv("DOWNLOAD_CHECKPOINT_BYTES", str(8 * 1024 * 1024)))
+PROGRESS_INTERVAL = 0.5
+
+STREAM_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                 requests.exceptions.Timeout)
+
+
+class Progress:
+    """Affichage de progression limité à une ligne toutes les PROGRESS_INTERVAL secondes"""
+
+    def __init__(self, total, already=0, enabled=True):
+        self.total = total
+        self.done = already
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.last_print = 0.0
+
+    def add(self, count):
+        with self.lock:
+            self.done += count
+            now = time.monotonic()
+            if self.enabled and now - self.last_print >= PROGRESS_INTERVAL:
+                self.last_print = now
+                self._print()
+
+    def finish(self):
+        if self.enabled:
+            self._print()
+            print()
+
+    def _print(self):
+        if self.total:
+            progress = (self.done / self.total) * 100
+            print(f"\r📥 Téléchargement: {progress:.1f}%", end="", flush=True)
+        else:
+            print(f"\r📥 Téléchargement: {self.done / (1024 * 1024):.1f} Mo", end="", flush=True)
+
+
+def _probe(url, headers):
+    """Renvoie (taille totale ou None, support des requêtes Range)"""
+    response = http_client.get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True)
+    try:
+        if response.status_code == 206:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            return (int(total) if total.isdigit() else None), True
+        if response.status_code == 200:
+            length = response.headers.get("Content-Length")
+            accepts = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            return (int(length) if length else None), accepts
+        raise IOError(f"Erreur de téléchargement: {response.status_code}")
+    finally:
+        response.close()
+
+
+def _download_single(url, part_path, total, ranges_ok, headers, progress):
+    """Flux unique, reprise à la fin du fichier .part après une coupure"""
+    for attempt in range(MAX_RESUMES + 1):
+        offset = os.path.getsize(part_path) if ranges_ok and os.path.exists(part_path) else 0
+        if total and offset == total:
+            return
+        if total and offset > total:
+            offset = 0
+
+        request_headers = dict(headers)
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+        response = http_client.get(url, headers=request_headers, stream=True)
+        try:
+            if response.status_code == 200:
+                mode, offset = "wb", 0
+            elif response.status_code == 206:
+                mode = "ab"
+            else:
+                raise IOError(f"Erreur de téléchargement: {response.status_code}")
+
+            progress.done = offset
+            with open(part_path, mode, buffering=CHUNK_SIZE) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        progress.add(len(chunk))
+            return
+        except STREAM_ERRORS:
+            if attempt >= MAX_RESUMES:
+                raise
+            print(f"\n🔁 Connexion interrompue, reprise à {os.path.getsize(part_path)} octets...")
+        finally:
+            response.close()
+
+
+def _download_segmented(url, part_path, total, segments, headers, progress_enabled):
+    """Téléchargement en plusieurs plages parallèles, avec état de reprise par segment"""
+    state_path = part_path + ".json"
+    state = None
+    if os.path.exists(state_path) and os.path.exists(part_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("total") != total:
+            state = None
+
+    if state is None:
+        size = -(-total // segments)
+        state = {
+            "total": total,
+            "segments": [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)],
+        }
+        with open(part_path, 'wb') as f:
+            f.truncate(total)
+
+    state_lock = threading.Lock()
+
+    def save_state():
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    already = sum(segment[2] for segment in state["segments"])
+    progress = Progress(total, already, progress_enabled)
+
+    def fetch(segment):
+        start, end, _ = segment
+        for attempt in range(MAX_RESUMES + 1):
+            position = start + segment[2]
+            if position > end:
+                return
+            response = http_client.get(url, headers={**headers, "Range": f"bytes={position}-{end}"}, stream=True)
+            try:
+                if response.status_code != 206:
+                    raise IOError(f"Plage refusée par le serveur: {response.status_code}")
+                # L'état ne compte que des octets déjà sur disque : après un arrêt brutal,
+                # la reprise retélécharge au pire le dernier intervalle non synchronisé
+                pending = 0
+                try:
+                    with open(part_path, 'r+b', buffering=CHUNK_SIZE) as f:
+                        f.seek(position)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                pending += len(chunk)
+                                progress.add(len(chunk))
+                                if pending >= CHECKPOINT_BYTES:
+                                    f.flush()
+                                    os.fsync(f.fileno())
+                                    with state_lock:
+                                        segment[2] += pending
+                                        save_state()
+                                    pending = 0
+                        f.flush()
+                        os.fsync(f.fileno())
+                finally:
+                    # Fichier fermé (donc vidé) : les octets restants peuvent être enregistrés
+                    if pending:
+                        with state_lock:
+                            segment[2] += pending
+                            save_state()
+                return
+            except STREAM_ERRORS:
+                if attempt >= MAX_RESUMES:
+                    raise
+            finally:
+                response.close()
+
+    with ThreadPoolExecutor(max_workers=len(state["segments"])) as executor:
+        for future in [executor.submit(fetch, segment) for segment in state["segments"]]:
+            future.result()
+    progress.finish()
+
+
+def download_file(url, filepath, segments=None, headers=None, progress=True):
+    """Télécharge url vers filepath via un fichier .part reprenable ; vérifie la taille finale"""
+    headers = headers or {}
+    segments = SEGMENTS if segments is None else segments
+    part_path = filepath + ".part"
+    state_path = part_path + ".json"
+
+    total, ranges_ok = _probe(url, headers)
+
+    if ranges_ok and total and segments > 1 and total >= PARALLEL_MIN_SIZE:
+        print(f"⚡ Téléchargement en {segments} segments parallèles ({total / (1024 * 1024):.1f} Mo)")
+        _download_segmented(url, part_path, total, segments, headers, progress)
+    else:
+        if os.path.exists(state_path):
+            # Un état segmenté ne vaut rien pour un flux unique
+            os.remove(state_path)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        already = os.path.getsize(part_path) if ranges_ok and os.path.exists(part_path) else 0
+        tracker = Progress(total, already, progress)
+        _download_single(url, part_path, total, ranges_ok, headers, tracker)
+        tracker.finish()
+
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise IOError(f"Taille incorrecte: {size} octets reçus sur {total} attendus")
+
+    os.replace(part_path, filepath)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return filepath
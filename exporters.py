@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import importlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import tracing
+from asset_store import get_store
+
+# Sur demande seulement (le livrable devient plusieurs fichiers), les formats découpables
+# sont écrits en volumes successifs de VOLUME_SIZE scènes
+EXPORT_VOLUMES = os.getenv("EXPORT_VOLUMES", "0") == "1"
+VOLUME_SIZE = int(os.getenv("EXPORT_VOLUME_SIZE", "100"))
+
+# Registre des formats d'export : nom -> extension, dossier par défaut, fonction de rendu
+EXPORTERS = {}
+_plugins_loaded = False
+
+
+def register_exporter(name, extension, folder="script", splittable=True):
+    """Décorateur enregistrant une fonction render(script_data, path) pour un format.
+
+    splittable indique que le format peut être écrit en plusieurs volumes pour les longs scripts."""
+    def decorator(render):
+        EXPORTERS[name] = {"extension": extension, "folder": folder, "render": render, "splittable": splittable}
+        return render
+    return decorator
+
+
+def load_plugins():
+    """Importe les modules listés dans EXPORTER_PLUGINS pour qu'ils enregistrent leurs formats"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for module_name in os.getenv("EXPORTER_PLUGINS", "").split(","):
+        if module_name.strip():
+            importlib.import_module(module_name.strip())
+
+
+def available_formats():
+    load_plugins()
+    return list(EXPORTERS)
+
+
+def make_stem():
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"script_formation_{timestamp}"
+
+
+def write_atomic(render, script_data, path):
+    """Rend dans un fichier temporaire du même dossier puis le renomme : jamais de fichier à moitié écrit"""
+    folder, filename = os.path.split(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = os.path.join(folder, f".{filename}.tmp")
+    try:
+        render(script_data, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def split_volumes(script_data, volume_size):
+    """Découpe le script en sous-scripts d'au plus volume_size scènes (volume, volumes en en-tête)"""
+    scenes = script_data.get('scenes', [])
+    count = max(1, -(-len(scenes) // volume_size))
+    for index in range(count):
+        volume = {key: value for key, value in script_data.items() if key != 'scenes'}
+        volume['scenes'] = scenes[index * volume_size:(index + 1) * volume_size]
+        volume['volume'] = index + 1
+        volume['volumes'] = count
+        yield volume
+
+
+@tracing.traced("export.write")
+def _timed_export(render, script_data, path, volume_size=None):
+    """Écrit un fichier, ou un volume après l'autre si volume_size est donné : un seul
+    document est en mémoire à la fois"""
+    start = time.perf_counter()
+    tracing.annotate(path=path, scenes=len(script_data.get('scenes', [])))
+    if not volume_size:
+        write_atomic(render, script_data, path)
+        return [path], time.perf_counter() - start
+
+    base, extension = os.path.splitext(path)
+    paths = []
+    for volume in split_volumes(script_data, volume_size):
+        volume_path = f"{base}_partie{volume['volume']:03d}{extension}"
+        write_atomic(render, volume, volume_path)
+        paths.append(volume_path)
+    return paths, time.perf_counter() - start
+
+
+@tracing.traced("export")
+def export_script(script_data, formats=None, stem=None, folder=None, executor=None, max_workers=None,
+                  volumes=None):
+    """Exporte le script dans les formats demandés, en parallèle, avec un nom de base commun.
+
+    folder remplace le dossier par défaut de chaque format ; executor vaut "thread" ou "process"
+    (EXPORT_EXECUTOR) ; volumes=True écrit les formats découpables en plusieurs fichiers de
+    EXPORT_VOLUME_SIZE scènes (défaut : EXPORT_VOLUMES, désactivé, un seul fichier par format).
+    Renvoie {format: {"path", "volumes", "seconds"}}."""
+    load_plugins()
+    formats = list(formats or EXPORTERS)
+    unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Format(s) d'export inconnu(s): {', '.join(unknown)}")
+
+    stem = stem or make_stem()
+    executor = executor or os.getenv("EXPORT_EXECUTOR", "thread")
+    if volumes is None:
+        volumes = EXPORT_VOLUMES
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+
+    jobs = {}
+    for fmt in formats:
+        exporter = EXPORTERS[fmt]
+        target_folder = folder or exporter["folder"]
+        volume_size = VOLUME_SIZE if volumes and exporter["splittable"] else None
+        jobs[fmt] = (exporter["render"], script_data,
+                     os.path.join(target_folder, f"{stem}{exporter['extension']}"), volume_size)
+
+    results = {}
+    start = time.perf_counter()
+    with pool_class(max_workers=max_workers or max(1, len(jobs))) as pool:
+        futures = {fmt: pool.submit(_timed_export, *job) for fmt, job in jobs.items()}
+        for fmt, future in futures.items():
+            try:
+                paths, seconds = future.result()
+                results[fmt] = {"path": paths[0], "volumes": paths, "seconds": round(seconds, 3)}
+            except Exception as e:
+                results[fmt] = {"path": None, "volumes": [], "seconds": None, "error": str(e)}
+
+    print(f"⏱️ Exports ({executor}, {time.perf_counter() - start:.2f}s au total):")
+    for fmt, result in results.items():
+        if len(result["volumes"]) > 1:
+            print(f"   {fmt}: {result['seconds']:.2f}s -> {len(result['volumes'])} volumes ({result['path']}, ...)")
+        elif result["path"]:
+            print(f"   {fmt}: {result['seconds']:.2f}s -> {result['path']}")
+        else:
+            print(f"   ❌ {fmt}: {result['error']}")
+    return results
+
+
+@register_exporter("json", ".json", folder="data", splittable=False)
+def render_json(script_data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(script_data, f, ensure_ascii=False, indent=2)
+
+
+def _volume_title(script_data):
+    title = script_data.get('titre_formation', 'Formation')
+    if script_data.get('volumes', 1) > 1:
+        title += f" (partie {script_data['volume']}/{script_data['volumes']})"
+    return title
+
+
+@register_exporter("pdf", ".pdf")
+def render_pdf(script_data, path):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+
+    pdf.cell(0, 10, _volume_title(script_data), ln=True)
+
+    # Description et objectifs uniquement dans le premier volume
+    if script_data.get('volume', 1) == 1:
+        pdf.set_font("Arial", '', 12)
+        pdf.multi_cell(0, 10, script_data.get('description', ''))
+
+        pdf.ln(5)
+        pdf.set_font("Arial", 'I', 12)
+        pdf.cell(0, 10, f"Durée estimée: {script_data.get('duree_estimee', 'N/A')}")
+        pdf.ln()
+        pdf.cell(0, 10, f"Niveau: {script_data.get('niveau', 'N/A')}")
+        pdf.ln(10)
+
+        # Objectifs
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, "Objectifs :", ln=True)
+        pdf.set_font("Arial", '', 12)
+        for obj in script_data.get('objectifs', []):
+            pdf.cell(0, 8, f"- {obj}", ln=True)
+    pdf.ln(10)
+
+    # Scènes
+    for scene in script_data.get('scenes', []):
+        pdf.set_font("Arial", 'B', 13)
+        pdf.cell(0, 10, f"Scène {scene['numero']}: {scene['titre']}", ln=True)
+
+        pdf.set_font("Arial", '', 12)
+        pdf.multi_cell(0, 10, f"Voix off:\n{scene['voix_off']}")
+        pdf.ln(3)
+        pdf.multi_cell(0, 10, f"Éléments visuels:\n{scene['elements_visuels']}")
+        pdf.ln(3)
+
+        if scene.get('points_cles'):
+            pdf.set_font("Arial", 'I', 12)
+            pdf.cell(0, 8, "Points clés:", ln=True)
+            pdf.set_font("Arial", '', 12)
+            for point in scene['points_cles']:
+                pdf.cell(0, 8, f"- {point}", ln=True)
+        pdf.ln(10)
+
+    pdf.output(path)
+
+
+def _scene_picture(scene):
+    """Chemin local d'une vignette de l'image de la scène (téléchargée au premier besoin), ou None"""
+    if os.getenv("ASSET_STORE", "1") == "0":
+        return None
+    asset = scene.get('image_asset')
+    url = scene.get('elements_visuels') or ""
+    try:
+        store = get_store()
+        if not (asset and store.path(asset)):
+            if not url.startswith(("http://", "https://")):
+                return None
+            asset = store.fetch(url)
+        return store.variant(asset, 640, 360)
+    except Exception as e:
+        print(f"⚠️ Vignette indisponible pour la scène {scene.get('numero')}: {e}")
+        return None
+
+
+@register_exporter("ppt", ".pptx")
+def render_ppt(script_data, path):
+    from pptx import Presentation
+
+    prs = Presentation()
+    # Les gabarits sont résolus une fois plutôt qu'à chaque slide
+    title_layout = prs.slide_layouts[0]
+    content_layout = prs.slide_layouts[1]
+    first_volume = script_data.get('volume', 1) == 1
+
+    # Slide de titre
+    title_slide = prs.slides.add_slide(title_layout)
+    title = title_slide.shapes.title
+    subtitle = title_slide.placeholders[1]
+
+    title.text = _volume_title(script_data)
+    subtitle.text = f"{script_data.get('description', '')}\n\nDurée: {script_data.get('duree_estimee', 'N/A')} | Niveau: {script_data.get('niveau', 'N/A')}"
+
+    # Slide des objectifs
+    if first_volume and script_data.get('objectifs'):
+        obj_slide = prs.slides.add_slide(content_layout)
+        obj_slide.shapes.title.text = "Objectifs de la formation"
+        content = obj_slide.placeholders[1]
+        content.text = "".join(f"• {obj}\n" for obj in script_data['objectifs'])
+
+    # Slides pour chaque scène
+    for scene in script_data.get('scenes', []):
+        slide = prs.slides.add_slide(content_layout)
+
+        # Titre de la scène
+        slide.shapes.title.text = f"Scène {scene['numero']}: {scene['titre']}"
+
+        # Contenu
+        parts = [
+            f"Voix off:\n{scene['voix_off']}\n\n",
+            f"Éléments visuels:\n{scene['elements_visuels']}\n\n",
+        ]
+        if scene.get('points_cles'):
+            parts.append("Points clés:\n")
+            parts.extend(f"• {point}\n" for point in scene['points_cles'])
+
+        body = slide.placeholders[1]
+        body.text = "".join(parts)
+
+        # Image de la scène, lue dans le magasin local (téléchargée une fois au premier besoin)
+        picture = _scene_picture(scene)
+        if picture:
+            # Les dimensions héritées du gabarit sont toutes recopiées avant de rétrécir le texte
+            left, top, height = body.left, body.top, body.height
+            body.left, body.top, body.width, body.height = left, top, int(prs.slide_width * 0.55), height
+            slide.shapes.add_picture(picture, int(prs.slide_width * 0.6), top, width=int(prs.slide_width * 0.36))
+
+    prs.save(path)
@@ -0,0 +1,378 @@
+import re
+import json
+import time
+import uuid
+import random
+import threading
+import urllib.request
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeServer:
+    """Serveur HTTP local lancé dans un thread, pour les tests et benchmarks hors ligne"""
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with server.lock:
+                    server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    status, headers, payload = 503, {}, {"error": "fake error"}
+                else:
+                    status, headers, payload = server.handle(method, self.path, self.headers, body)
+                self._send(method, status, headers, payload)
+
+            def _send(self, method, status, headers, payload):
+                if isinstance(payload, (dict, list)):
+                    payload = json.dumps(payload).encode("utf-8")
+                    headers = {"Content-Type": "application/json", **headers}
+                elif isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                payload = payload or b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if method != "HEAD":
+                    self.wfile.write(payload)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_HEAD(self):
+                self._dispatch("HEAD")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, method, path, headers, body):
+        return 404, {}, {"error": "not found"}
+
+    def ranged(self, data, headers, content_type="application/octet-stream"):
+        """Réponse binaire respectant un éventuel en-tête Range (bytes=début-fin)"""
+        response_headers = {"Content-Type": content_type, "Accept-Ranges": "bytes"}
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", headers.get("Range") or "")
+        if not match:
+            return 200, response_headers, data
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(data) - 1
+        end = min(end, len(data) - 1)
+        if start > end:
+            return 416, {"Content-Range": f"bytes */{len(data)}"}, b""
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return 206, response_headers, data[start:end + 1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeSynthesiaServer(FakeServer):
+    """Imite l'API vidéo Synthesia : soumission, statut puis téléchargement du MP4"""
+
+    def __init__(self, queue_seconds=0.5, render_seconds=2.0, failure_rate=0.0,
+                 video_size=256 * 1024, video_file=None, webhook_drop_rate=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.queue_seconds = queue_seconds
+        self.render_seconds = render_seconds
+        self.failure_rate = failure_rate
+        self.video_size = video_size
+        # Vrai MP4 servi pour chaque rendu (assemblage, sous-titres), sinon des octets factices
+        self.video_file = video_file
+        self.videos = {}
+        self.submit_count = 0
+        self.poll_count = 0
+        self.peak_in_flight = 0
+        # Webhooks enregistrés : à la fin de chaque rendu, une notification leur est envoyée
+        # (sauf une proportion webhook_drop_rate, perdue pour tester le repli sur le polling)
+        self.webhooks = {}
+        self.webhook_drop_rate = webhook_drop_rate
+        self.callback_count = 0
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v2/videos"
+
+    def _status(self, video):
+        elapsed = time.monotonic() - video["created"]
+        if elapsed < self.queue_seconds:
+            return "queued"
+        if elapsed < self.queue_seconds + self.render_seconds:
+            return "in_progress"
+        return "failed" if video["fails"] else "complete"
+
+    def in_flight(self):
+        return sum(1 for video in self.videos.values() if self._status(video) in ("queued", "in_progress"))
+
+    def video_bytes(self, video_id):
+        if self.video_file:
+            with open(self.video_file, 'rb') as f:
+                return f.read()
+        seed = video_id.encode("utf-8")
+        return (seed * (self.video_size // len(seed) + 1))[:self.video_size]
+
+    def _video_info(self, video_id):
+        video = self.videos[video_id]
+        status = self._status(video)
+        info = {"id": video_id, "status": status, "title": video["title"]}
+        if status == "complete":
+            info["download"] = f"{self.url}/downloads/{video_id}.mp4"
+        return info
+
+    def _notify(self, video_id):
+        """Envoie la notification de fin de rendu à chaque webhook enregistré"""
+        if self.webhook_drop_rate and random.random() < self.webhook_drop_rate:
+            return
+        info = self._video_info(video_id)
+        event = {"type": "video.completed" if info["status"] == "complete" else "video.failed", "data": info}
+        for url in list(self.webhooks.values()):
+            request = urllib.request.Request(url, data=json.dumps(event).encode("utf-8"), method="POST",
+                                             headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+                with self.lock:
+                    self.callback_count += 1
+            except Exception:
+                pass
+
+    def handle(self, method, path, headers, body):
+        if method == "POST" and path == "/v2/webhooks":
+            payload = json.loads(body or b"{}")
+            webhook_id = str(uuid.uuid4())
+            with self.lock:
+                self.webhooks[webhook_id] = payload.get("url")
+            return 201, {}, {"id": webhook_id, "url": payload.get("url"), "events": payload.get("events", [])}
+
+        match = re.fullmatch(r"/v2/webhooks/([\w-]+)", path)
+        if method == "DELETE" and match:
+            with self.lock:
+                removed = self.webhooks.pop(match.group(1), None)
+            return (204, {}, b"") if removed else (404, {}, {"error": "unknown webhook"})
+
+        if method == "POST" and path == "/v2/videos":
+            payload = json.loads(body or b"{}")
+            video_id = str(uuid.uuid4())
+            with self.lock:
+                self.submit_count += 1
+                self.videos[video_id] = {
+                    "created": time.monotonic(),
+                    "title": payload.get("title", ""),
+                    "payload": payload,
+                    "fails": random.random() < self.failure_rate,
+                }
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight())
+            if self.webhooks:
+                timer = threading.Timer(self.queue_seconds + self.render_seconds, self._notify, (video_id,))
+                timer.daemon = True
+                timer.start()
+            return 201, {}, {"id": video_id, "status": "queued"}
+
+        match = re.fullmatch(r"/v2/videos/([\w-]+)", path)
+        if method == "GET" and match:
+            video = self.videos.get(match.group(1))
+            if video is None:
+                return 404, {}, {"error": "unknown video"}
+            with self.lock:
+                self.poll_count += 1
+            return 200, {}, self._video_info(match.group(1))
+
+        match = re.fullmatch(r"/downloads/([\w-]+)\.mp4", path)
+        if method in ("GET", "HEAD") and match and match.group(1) in self.videos:
+            return self.ranged(self.video_bytes(match.group(1)), headers, "video/mp4")
+
+        return super().handle(method, path, headers, body)
+
+
+class FakeImageServer(FakeServer):
+    """Base des fausses API d'images : sert aussi les photos (HEAD de validation, GET du rendu)"""
+
+    def __init__(self, miss_rate=0.0, image_size=16 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.miss_rate = miss_rate
+        self.image_size = image_size
+        self.search_count = 0
+
+    def search(self, query):
+        """URL de photo pour la requête, ou None pour simuler une recherche sans résultat"""
+        with self.lock:
+            self.search_count += 1
+        if self.miss_rate and random.random() < self.miss_rate:
+            return None
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "photo"
+        return f"{self.url}/photos/{slug}.jpeg"
+
+    def handle(self, method, path, headers, body):
+        if method in ("GET", "HEAD") and re.fullmatch(r"/photos/[\w-]+\.jpeg", path):
+            return self.ranged(b"\xff\xd8\xff" + b"\0" * (self.image_size - 3), headers, "image/jpeg")
+        return super().handle(method, path, headers, body)
+
+
+class FakePexelsServer(FakeImageServer):
+    """Imite GET /v1/search de Pexels (réponse {"photos": [{"src": {"large": ...}}]})"""
+
+    @property
+    def api_url(self):
+        return self.url
+
+    def handle(self, method, path, headers, body):
+        parsed = urlparse(path)
+        if method == "GET" and parsed.path == "/v1/search":
+            query = parse_qs(parsed.query).get("query", [""])[0]
+            image_url = self.search(query)
+            photos = [{"id": 1, "src": {"large": image_url, "original": image_url}}] if image_url else []
+            return 200, {}, {"photos": photos, "total_results": len(photos)}
+        return super().handle(method, path, headers, body)
+
+
+class FakeUnsplashServer(FakeImageServer):
+    """Imite GET /search/photos d'Unsplash (réponse {"results": [{"urls": {"regular": ...}}]})"""
+
+    @property
+    def api_url(self):
+        return self.url
+
+    def handle(self, method, path, headers, body):
+        parsed = urlparse(path)
+        if method == "GET" and parsed.path == "/search/photos":
+            query = parse_qs(parsed.query).get("query", [""])[0]
+            image_url = self.search(query)
+            results = [{"id": "1", "urls": {"regular": image_url, "full": image_url}}] if image_url else []
+            return 200, {}, {"results": results, "total": len(results)}
+        return super().handle(method, path, headers, body)
+
+
+class FakeGeminiChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Remplace genai.GenerativeModel : renvoie un script JSON plausible après un délai réglable.
+
+    À installer sur un générateur avec generator._model = FakeGeminiModel(...)."""
+
+    def __init__(self, seconds=2.0, scenes=10, error_rate=0.0, chunk_size=200, broken_scene_rate=0.0):
+        self.seconds = seconds
+        self.scenes = scenes
+        self.error_rate = error_rate
+        # Proportion de scènes renvoyées sans voix off (à réparer par le générateur)
+        self.broken_scene_rate = broken_scene_rate
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.call_count = 0
+
+    def scene(self, subject, i):
+        return {
+            "numero": i,
+            "titre": f"{subject} - partie {i}",
+            "voix_off": " ".join(["Dans cette partie nous présentons les notions essentielles."] * 20),
+            "elements_visuels": f"{subject} concept {i}",
+            "points_cles": [f"Point clé {i}.{j}" for j in range(1, 4)],
+        }
+
+    def script(self, prompt):
+        subject = prompt.rsplit(":", 1)[-1].strip()[:80] or "Formation"
+        scenes = [self.scene(subject, i) for i in range(1, self.scenes + 1)]
+        for scene in scenes:
+            if self.broken_scene_rate and random.random() < self.broken_scene_rate:
+                del scene["voix_off"]
+        script = {
+            "titre_formation": f"Formation : {subject}",
+            "description": f"Formation complète sur {subject}",
+            "duree_estimee": "45 minutes",
+            "niveau": "Débutant",
+            "objectifs": [f"Objectif {i}" for i in range(1, 5)],
+            "scenes": scenes,
+        }
+        return script
+
+    def script_text(self, prompt):
+        return "```json\n" + json.dumps(self.script(prompt), ensure_ascii=False, indent=2) + "\n```"
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        with self.lock:
+            self.call_count += 1
+        if self.error_rate and random.random() < self.error_rate:
+            time.sleep(self.seconds / 4)
+            raise Exception("503 fake Gemini error")
+        schema = (generation_config or {}).get("response_schema") or {}
+        properties = schema.get("properties", {})
+        if "voix_off" in properties:
+            # Demande d'une seule scène (plan ou réparation) : durée proportionnelle à une scène
+            time.sleep(self.seconds / max(1, self.scenes))
+            match = re.search(r"sc[eè]ne (\d+)", prompt)
+            scene = self.scene("Scène rédigée", int(match.group(1)) if match else 0)
+            return FakeGeminiChunk(json.dumps(scene, ensure_ascii=False))
+        if "resume" in properties.get("scenes", {}).get("items", {}).get("properties", {}):
+            # Plan : titres et résumés seulement, à peu près deux scènes de texte
+            time.sleep(2 * self.seconds / max(1, self.scenes))
+            outline = self.script(prompt)
+            for scene in outline["scenes"]:
+                scene["resume"] = f"Notions de la partie {scene['numero']}"
+                for field in ("voix_off", "elements_visuels", "points_cles"):
+                    scene.pop(field, None)
+            return FakeGeminiChunk(json.dumps(outline, ensure_ascii=False))
+        text = self.script_text(prompt)
+        if not stream:
+            time.sleep(self.seconds)
+            return FakeGeminiChunk(text)
+
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        delay = self.seconds / max(1, len(chunks))
+
+        def generate():
+            for chunk in chunks:
+                time.sleep(delay)
+                yield FakeGeminiChunk(chunk)
+        return generate()
+
+
+if __name__ == "__main__":
+    with FakeSynthesiaServer(queue_seconds=2, render_seconds=10) as fake:
+        print(f"🧪 Faux Synthesia démarré : SYNTHESIA_API_URL={fake.api_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n👋 Arrêt du faux serveur")
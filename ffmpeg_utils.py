@@ -0,0 +1,121 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+import tempfile
+
+# Résultats des sondes (chemin de ffmpeg, ffmpeg fonctionnel) conservés d'une exécution à l'autre
+CAPABILITIES_PATH = os.getenv("CAPABILITIES_CACHE_PATH", os.path.join("data", "capabilities.json"))
+
+_ffmpeg_path = None
+_ffmpeg_ok = None
+
+
+def _load_capabilities():
+    try:
+        with open(CAPABILITIES_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_capability(key, value):
+    capabilities = _load_capabilities()
+    capabilities[key] = value
+    try:
+        folder = os.path.dirname(CAPABILITIES_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{CAPABILITIES_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(capabilities, f, indent=2)
+        os.replace(tmp_path, CAPABILITIES_PATH)
+    except OSError:
+        pass
+
+
+def _fingerprint(path):
+    """Identifie un binaire par chemin, taille et date : une mise à jour invalide la sonde"""
+    resolved = shutil.which(path) or path
+    try:
+        stat = os.stat(resolved)
+    except OSError:
+        return None
+    return f"{resolved}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def ffmpeg_exe():
+    """Chemin de ffmpeg : FFMPEG_BINARY, sinon celui fourni par imageio-ffmpeg, sinon celui du PATH"""
+    global _ffmpeg_path
+    if _ffmpeg_path is None:
+        _ffmpeg_path = os.getenv("FFMPEG_BINARY")
+        if not _ffmpeg_path:
+            cached = _load_capabilities().get("ffmpeg_path")
+            if cached and os.path.exists(cached):
+                _ffmpeg_path = cached
+            else:
+                try:
+                    import imageio_ffmpeg
+                    _ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
+                except (ImportError, RuntimeError):
+                    _ffmpeg_path = shutil.which("ffmpeg") or "ffmpeg"
+                if os.path.exists(_ffmpeg_path):
+                    _save_capability("ffmpeg_path", _ffmpeg_path)
+    return _ffmpeg_path
+
+
+def ffmpeg_available():
+    """Sonde ffmpeg -version au premier appel, mémorisée sur disque tant que le binaire ne change pas"""
+    global _ffmpeg_ok
+    if _ffmpeg_ok is None:
+        fingerprint = _fingerprint(ffmpeg_exe())
+        cached = _load_capabilities().get("ffmpeg")
+        if fingerprint is None:
+            _ffmpeg_ok = False
+        elif cached and cached.get("fingerprint") == fingerprint:
+            _ffmpeg_ok = cached["available"]
+        else:
+            try:
+                subprocess.run([ffmpeg_exe(), '-version'], capture_output=True, check=True)
+                _ffmpeg_ok = True
+            except (subprocess.CalledProcessError, OSError):
+                _ffmpeg_ok = False
+            _save_capability("ffmpeg", {"fingerprint": fingerprint, "available": _ffmpeg_ok})
+    return _ffmpeg_ok
+
+
+def run_ffmpeg(args):
+    """Lance ffmpeg sans interaction ; lève une exception avec la fin de stderr en cas d'échec"""
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"❌ FFmpeg a échoué ({result.returncode}): {result.stderr.strip()[-500:]}")
+    return result
+
+
+def probe_duration(path):
+    """Durée en secondes lue dans l'en-tête du fichier (None si inconnue)"""
+    result = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def concat_files(paths, output_path):
+    """Assemble des vidéos de mêmes paramètres (codec, taille, fps) sans réencodage"""
+    folder = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(folder, exist_ok=True)
+    fd, list_path = tempfile.mkstemp(suffix=".txt", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path,
+                    "-c", "copy", "-movflags", "+faststart", output_path])
+    finally:
+        os.remove(list_path)
+    return output_path
@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+import tracing
+
+load_dotenv()
+
+# Délais par défaut (connexion, lecture) en secondes
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Méthodes rejouables sans risque de doublon côté serveur
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_request_counts = {}
+_retry_counts = {}
+
+
+def get_session():
+    """Session partagée : connexions keep-alive mises en pool par hôte"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests n'est importé qu'au premier appel réseau
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _host_key(hostname, port, scheme):
+    default_port = 443 if scheme == "https" else 80
+    if port is None or port == default_port:
+        return hostname
+    return f"{hostname}:{port}"
+
+
+def _count(counter, host):
+    with _stats_lock:
+        counter[host] = counter.get(host, 0) + 1
+
+
+def _retry_delay(attempt, response=None):
+    """Backoff exponentiel avec jitter complet, en respectant Retry-After si présent"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method, url, timeout=None, retries=None, **kwargs):
+    """Envoie une requête via la session partagée avec timeout et nouvelles tentatives"""
+    method = method.upper()
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if retries is None:
+        retries = MAX_RETRIES
+
+    parsed = urlparse(url)
+    host = _host_key(parsed.hostname, parsed.port, parsed.scheme)
+    session = get_session()
+    import requests
+
+    with tracing.span(f"http.{method}", host=host, path=parsed.path) as current:
+        for attempt in range(retries + 1):
+            _count(_request_counts, host)
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Un POST peut avoir été reçu avant l'erreur (ex: ReadTimeout) : seul un échec de
+                # connexion garantit qu'il n'a pas été envoyé, sinon on risque un rendu en double
+                sent_safely = method in IDEMPOTENT_METHODS or isinstance(e, requests.exceptions.ConnectTimeout)
+                if attempt >= retries or not sent_safely:
+                    raise
+                _count(_retry_counts, host)
+                time.sleep(_retry_delay(attempt))
+                continue
+
+            # Un POST n'est rejoué que si le serveur l'a explicitement refusé (429)
+            retryable = response.status_code == 429 or (
+                response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+            )
+            if not retryable or attempt >= retries:
+                current.set(status=response.status_code, retries=attempt,
+                            bytes=int(response.headers.get("Content-Length") or 0))
+                return response
+
+            _count(_retry_counts, host)
+            delay = _retry_delay(attempt, response)
+            response.close()
+            time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault("allow_redirects", False)
+    return request("HEAD", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def stats():
+    """Requêtes, nouvelles tentatives et connexions créées par hôte"""
+    connections = {}
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    host = _host_key(pool.host, pool.port, pool.scheme)
+                    connections[host] = connections.get(host, 0) + pool.num_connections
+
+    with _stats_lock:
+        hosts = set(_request_counts) | set(connections)
+        return {
+            host: {
+                "requests": _request_counts.get(host, 0),
+                "retries": _retry_counts.get(host, 0),
+                "connections": connections.get(host, 0),
+            }
+            for host in sorted(hosts)
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _request_counts.clear()
+        _retry_counts.clear()
+
+
+def print_stats():
+    current = stats()
+    if not current:
+        return
+    print("🌐 Requêtes HTTP par hôte:")
+    for host, values in current.items():
+        print(f"   {host}: {values['requests']} requêtes, {values['retries']} relances, "
+              f"{values['connections']} nouvelles connexions")
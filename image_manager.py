@@ -1,15 +1,113 @@
 import os
-import requests
+import http_client
+import tracing
 from urllib.parse import urlparse
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
+from cache_store import CacheStore
+from asset_store import AssetStore
+from keyword_index import KeywordIndex, load_keyword_file, keyword_files
 
 load_dotenv()
 
-class ImageManager:
+# Durées de vie du cache d'images (secondes)
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", str(7 * 24 * 3600)))
+IMAGE_CACHE_NEGATIVE_TTL = int(os.getenv("IMAGE_CACHE_NEGATIVE_TTL", "3600"))
+# Téléchargement des images dès leur résolution (sinon à la première lecture locale : rendu local, PPT)
+ASSET_PREFETCH = os.getenv("ASSET_PREFETCH", "0") == "1"
+
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons, partagé entre threads"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Bloque jusqu'à ce qu'un jeton soit disponible"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """Partage un seul appel en cours entre tous les demandeurs d'une même clé"""
+
     def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self.calls[key] = call
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+
+class ImageManager:
+    def __init__(self, max_workers=None, cache=None, assets=None):
         self.pexels_key = os.getenv("PEXELS_API_KEY")
-        
+        self.unsplash_key = os.getenv("UNSPLASH_ACCESS_KEY")
+        # URLs des API, remplaçables par les faux serveurs locaux des benchmarks
+        self.pexels_url = os.getenv("PEXELS_API_URL", "https://api.pexels.com")
+        self.unsplash_url = os.getenv("UNSPLASH_API_URL", "https://api.unsplash.com")
+
+        # Nombre de scènes résolues en parallèle (1 = mode séquentiel)
+        if max_workers is None:
+            max_workers = int(os.getenv("IMAGE_MAX_WORKERS", "4"))
+        self.max_workers = max(1, max_workers)
+
+        # Un seau de jetons par fournisseur remplace l'ancienne pause fixe : il se remplit au rythme
+        # du quota horaire du fournisseur (Pexels 200/h, Unsplash 50/h en mode démo) et laisse passer
+        # une rafale de BURST recherches, assez pour les scènes d'une formation sans attente
+        self.rate_limiters = {
+            "pexels": TokenBucket(float(os.getenv("PEXELS_RATE_PER_HOUR", "200")) / 3600,
+                                  float(os.getenv("PEXELS_BURST", "50"))),
+            "unsplash": TokenBucket(float(os.getenv("UNSPLASH_RATE_PER_HOUR", "50")) / 3600,
+                                    float(os.getenv("UNSPLASH_BURST", "20"))),
+        }
+        self._single_flight = SingleFlight()
+
+        # Cache persistant des recherches et des validations d'URL (cache=False pour désactiver)
+        if cache is None and os.getenv("IMAGE_CACHE", "1") != "0":
+            cache = CacheStore()
+        self.cache = cache or None
+
+        # Magasin local des images résolues, adressé par contenu (assets=False pour désactiver)
+        if assets is None and os.getenv("ASSET_STORE", "1") != "0":
+            assets = AssetStore()
+        self.assets = assets or None
 
         self.fallback_urls = {
             "technology": "https://images.pexels.com/photos/3861969/pexels-photo-3861969.jpeg",
@@ -65,44 +163,96 @@ class ImageManager:
             "régression": "statistics mathematics"
         }
 
+        # Index compilés une fois : une seule passe par titre, accents et pluriels ignorés
+        self.search_index = KeywordIndex(self.keywords_map)
+        self.fallback_index = KeywordIndex()
+        for category in self.fallback_urls:
+            if category != "default":
+                self.fallback_index.add(category.replace("_", " "), category)
+        for path in keyword_files():
+            search_terms, fallback_urls = load_keyword_file(path)
+            for keyword, search_term, weight in search_terms:
+                self.keywords_map[keyword] = search_term
+                self.search_index.add(keyword, search_term, weight)
+            for category, url in fallback_urls:
+                self.fallback_urls[category] = url
+                self.fallback_index.add(category.replace("_", " "), category)
+
+    def _cached(self, namespace, key, compute):
+        """Passe par le cache persistant ; les résultats vides sont mis en cache négativement,
+        les erreurs (exceptions de compute) ne le sont pas"""
+        if not self.cache:
+            return compute()
+        return self.cache.get_or_compute(namespace, key, compute, IMAGE_CACHE_TTL, IMAGE_CACHE_NEGATIVE_TTL)
+
     def validate_image_url(self, url, timeout=10):
         try:
-            parsed = urlparse(url)
-            if not all([parsed.scheme, parsed.netloc]):
-                return False
-            response = requests.head(url, timeout=timeout)
-            return response.status_code == 200
-        except:
+            return self._validate_or_raise(url, timeout)
+        except Exception:
+            # Erreur réseau : l'URL est écartée pour cette fois, sans mémoriser d'échec
+            return False
+
+    def _validate_or_raise(self, url, timeout=10):
+        """Comme validate_image_url, mais une erreur réseau lève au lieu de renvoyer False
+        (pour qu'une recherche mise en cache ne mémorise pas un échec passager)"""
+        parsed = urlparse(url)
+        if not all([parsed.scheme, parsed.netloc]):
             return False
+        return self._cached("url_valid", url, lambda: self._check_image_url(url, timeout))
+
+    @tracing.traced("images.check_url")
+    def _check_image_url(self, url, timeout=10):
+        response = http_client.head(url, timeout=timeout)
+        return response.status_code == 200
 
     def get_image_from_pexels(self, search_term):
         try:
-            headers = {"Authorization": self.pexels_key}
-            params = {"query": search_term, "per_page": 1}
-            response = requests.get("https://api.pexels.com/v1/search", headers=headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if data['photos']:
-                    image_url = data['photos'][0]['src']['large']
-                    if self.validate_image_url(image_url):
-                        return image_url
+            return self._cached("pexels", search_term.strip().lower(),
+                                lambda: self._search_pexels(search_term))
         except Exception as e:
             print(f"⚠️ Erreur API Pexels: {e}")
+            return None
+
+    @tracing.traced("images.search")
+    def _search_pexels(self, search_term):
+        """URL de la première photo valide, None si Pexels n'a rien trouvé ; lève en cas d'erreur"""
+        tracing.annotate(provider="pexels", term=search_term)
+        headers = {"Authorization": self.pexels_key}
+        params = {"query": search_term, "per_page": 1}
+        self.rate_limiters["pexels"].acquire()
+        response = http_client.get(f"{self.pexels_url}/v1/search", headers=headers, params=params)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}")
+        data = response.json()
+        if data['photos']:
+            image_url = data['photos'][0]['src']['large']
+            if self._validate_or_raise(image_url):
+                return image_url
         return None
 
     def get_image_from_unsplash(self, search_term):
         try:
-            headers = {"Authorization": f"Client-ID {self.unsplash_key}"}
-            url = f"https://api.unsplash.com/search/photos?query={search_term}&per_page=1&orientation=landscape"
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data['results']:
-                    image_url = data['results'][0]['urls']['regular']
-                    if self.validate_image_url(image_url):
-                        return image_url
+            return self._cached("unsplash", search_term.strip().lower(),
+                                lambda: self._search_unsplash(search_term))
         except Exception as e:
             print(f"⚠️ Erreur API Unsplash: {e}")
+            return None
+
+    @tracing.traced("images.search")
+    def _search_unsplash(self, search_term):
+        """URL de la première photo valide, None si Unsplash n'a rien trouvé ; lève en cas d'erreur"""
+        tracing.annotate(provider="unsplash", term=search_term)
+        headers = {"Authorization": f"Client-ID {self.unsplash_key}"}
+        url = f"{self.unsplash_url}/search/photos?query={search_term}&per_page=1&orientation=landscape"
+        self.rate_limiters["unsplash"].acquire()
+        response = http_client.get(url, headers=headers, timeout=5)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}")
+        data = response.json()
+        if data['results']:
+            image_url = data['results'][0]['urls']['regular']
+            if self._validate_or_raise(image_url):
+                return image_url
         return None
 
     def get_valid_image_url(self, search_term, retries=3):
@@ -118,46 +268,88 @@ class ImageManager:
             if image_url:
                 return image_url
 
-        # 3. Sinon utiliser une fallback
-        search_lower = search_term.lower()
-        for category, url in self.fallback_urls.items():
-            if category in search_lower:
-                if self.validate_image_url(url):
-                    return url
+        # 3. Sinon utiliser une fallback, de la catégorie la plus pertinente à la moins pertinente
+        for category, _ in self.fallback_index.rank(search_term):
+            url = self.fallback_urls.get(category)
+            if url and self.validate_image_url(url):
+                return url
 
         return self.fallback_urls["default"]
 
     def extract_search_term(self, title):
-        title_lower = title.lower()
-        for keyword, search_term in self.keywords_map.items():
-            if keyword in title_lower:
-                return search_term
-        return "technology artificial intelligence computer"
+        return self.search_index.best(title, "technology artificial intelligence computer")
+
+    def resolve_image_url(self, search_term):
+        """Comme get_valid_image_url, mais une seule recherche en vol par terme"""
+        return self._single_flight.do(search_term.strip().lower(),
+                                      lambda: self.get_valid_image_url(search_term))
 
-    def validate_and_fix_image_urls(self, script_data):
+    def store_asset(self, url, messages):
+        """Hash de l'image dans le magasin local si elle y est déjà ; avec ASSET_PREFETCH, la télécharge
+        (une seule fois par URL). Sinon le rendu local ou l'export PPT la téléchargeront au besoin."""
+        if not self.assets:
+            return None
+        if not ASSET_PREFETCH:
+            return self.assets.lookup_url(url)
+        try:
+            return self.assets.fetch(url)
+        except Exception as e:
+            messages.append(f"⚠️ Image non stockée localement: {e}")
+            return None
+
+    @tracing.traced("images.resolve_scene")
+    def resolve_scene_image(self, scene):
+        """Résout l'image d'une scène et renvoie (nouvelle URL ou None, messages, hash de l'image ou None)"""
+        tracing.annotate(scene=scene.get('numero'))
+        current_description = scene['elements_visuels']
+        messages = [f"   Recherche d'image pour: '{current_description}'"]
+
+        # Si c'est déjà une URL, la valider
+        if current_description.startswith(('http://', 'https://')):
+            if self.validate_image_url(current_description):
+                messages.append("✅ URL existante valide")
+                return None, messages, self.store_asset(current_description, messages)
+            messages.append("❌ URL existante invalide, recherche d'une nouvelle image...")
+
+        # Rechercher une image basée sur la description/mots-clés
+        new_url = self.resolve_image_url(current_description)
+        messages.append(f"✅ Image trouvée: {new_url}")
+        return new_url, messages, self.store_asset(new_url, messages)
+
+    @tracing.traced("images.validate_and_fix")
+    def validate_and_fix_image_urls(self, script_data, max_workers=None, prefetched=None):
+        """Attribue une image à chaque scène ; prefetched contient les futures déjà lancées
+        pour les premières scènes (génération en streaming)"""
         print("🔍 Recherche et attribution d'images...")
-        
-        for i, scene in enumerate(script_data['scenes']):
-            current_description = scene['elements_visuels']
+
+        scenes = script_data['scenes']
+        prefetched = list(prefetched or [])[:len(scenes)]
+        remaining = scenes[len(prefetched):]
+        workers = min(max_workers or self.max_workers, max(1, len(remaining)))
+        tracing.annotate(scenes=len(scenes), prefetched=len(prefetched), workers=workers)
+
+        if workers > 1:
+            print(f"⚡ Résolution parallèle ({workers} workers)")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = prefetched + [executor.submit(self.resolve_scene_image, scene) for scene in remaining]
+                results = [future.result() for future in futures]
+        else:
+            results = [future.result() for future in prefetched]
+            results += [self.resolve_scene_image(scene) for scene in remaining]
+
+        # Application et affichage dans l'ordre des scènes
+        for i, (scene, (new_url, messages, asset)) in enumerate(zip(scenes, results)):
             print(f"📷 Scène {i+1}: '{scene['titre']}'")
-            print(f"   Recherche d'image pour: '{current_description}'")
-            
-            # Si c'est déjà une URL, la valider
-            if current_description.startswith(('http://', 'https://')):
-                if self.validate_image_url(current_description):
-                    print(f"✅ URL existante valide")
-                    continue
-                else:
-                    print(f"❌ URL existante invalide, recherche d'une nouvelle image...")
-            
-            # Rechercher une image basée sur la description/mots-clés
-            new_url = self.get_valid_image_url(current_description)
-            scene['elements_visuels'] = new_url
-            print(f"✅ Image trouvée: {new_url}")
-            
-            # Petite pause pour éviter de surcharger l'API
-            time.sleep(0.5)
-        
+            for message in messages:
+                print(message)
+            if new_url:
+                scene['elements_visuels'] = new_url
+            # Référence locale de l'image : les rendus suivants la relisent sans réseau
+            if asset:
+                scene['image_asset'] = asset
+            else:
+                scene.pop('image_asset', None)
+
         return script_data
 
     def get_fallback_url_by_category(self, category):
@@ -166,6 +358,7 @@ class ImageManager:
     def add_fallback_url(self, category, url):
         if self.validate_image_url(url):
             self.fallback_urls[category] = url
+            self.fallback_index.add(category.replace("_", " "), category)
             return True
         return False
 
@@ -0,0 +1,450 @@
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+import tracing
+
+DEFAULT_JOBS_DIR = os.path.join("data", "jobs")
+
+# Étapes d'une formation, dans l'ordre : une étape enregistrée n'est jamais refaite à la reprise
+STAGES = ["script", "images", "exported", "submitted", "downloaded", "subtitled"]
+SCRIPT_FILE = "script.json"
+
+
+class JobStore:
+    """Suivi persistant (SQLite) des formations : étapes terminées, données de reprise et artefacts.
+
+    Chaque formation a son dossier (script, exports, vidéos) à côté de la base."""
+
+    def __init__(self, root=None):
+        self.root = root or os.getenv("JOB_STORE_DIR", DEFAULT_JOBS_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, "jobs.sqlite3"), check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    prompt TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    stage TEXT,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS stages (
+                    job_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    seconds REAL,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, stage)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def artifact(self, job_id, name):
+        """Chemin d'un artefact dans le dossier de la formation"""
+        return os.path.join(self.job_dir(job_id), name)
+
+    def write_json(self, job_id, name, value):
+        path = self.artifact(job_id, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def read_json(self, job_id, name):
+        with open(self.artifact(job_id, name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def create(self, prompt, options=None, job_id=None, status="running"):
+        job_id = job_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, prompt, options, stage, status, data, error, created_at, updated_at) "
+                "VALUES (?, ?, ?, NULL, ?, '{}', NULL, ?, ?)",
+                (job_id, prompt, json.dumps(options or {}, ensure_ascii=False), status, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """La formation (dict) avec la liste de ses étapes terminées, ou None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, prompt, options, stage, status, data, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            stages = self.conn.execute(
+                "SELECT stage, seconds FROM stages WHERE job_id = ? ORDER BY completed_at", (job_id,)
+            ).fetchall()
+        return self._job(row, stages)
+
+    def _job(self, row, stages):
+        job_id, prompt, options, stage, status, data, error, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "prompt": prompt,
+            "options": json.loads(options),
+            "stage": stage,
+            "status": status,
+            "data": json.loads(data),
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "stages": {name: seconds for name, seconds in stages},
+        }
+
+    def _merge(self, job_id, values, stage=None, status=None, error=None, options=None):
+        """Fusionne values dans data (lecture et écriture dans la même transaction)"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT data, options FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Formation inconnue: {job_id}")
+            data = {**json.loads(row[0]), **values}
+            merged_options = {**json.loads(row[1]), **(options or {})}
+            self.conn.execute(
+                "UPDATE jobs SET data = ?, options = ?, stage = COALESCE(?, stage), status = COALESCE(?, status), "
+                "error = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(data, ensure_ascii=False), json.dumps(merged_options, ensure_ascii=False),
+                 stage, status, error, time.time(), job_id)
+            )
+
+    def update(self, job_id, options=None, **values):
+        """Enregistre des données de reprise (ex: IDs vidéo) sans changer d'étape"""
+        self._merge(job_id, values, options=options)
+        return self.get(job_id)
+
+    def advance(self, job_id, stage, seconds=None, **values):
+        """Marque une étape comme terminée, avec les données qu'elle a produites"""
+        if stage not in STAGES:
+            raise ValueError(f"Étape inconnue: {stage}")
+        self._merge(job_id, values, stage=stage, status="running")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stages (job_id, stage, seconds, completed_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, None if seconds is None else round(seconds, 3), time.time())
+            )
+        return self.get(job_id)
+
+    def start(self, job_id, expected=None):
+        """Formation prise en charge par un worker (elle était en file d'attente ou interrompue).
+
+        Avec expected, la prise en charge est atomique : None si la formation n'était plus dans ce statut
+        (déjà prise par un autre processus, le service ou `job_store.py resume`)."""
+        if expected is None:
+            self._merge(job_id, {}, status="running")
+        else:
+            with self.lock, self.conn:
+                claimed = self.conn.execute(
+                    "UPDATE jobs SET status = 'running', error = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                    (time.time(), job_id, expected)
+                ).rowcount
+            if not claimed:
+                return None
+        return self.get(job_id)
+
+    def requeue(self, job_id):
+        """Remet en file une formation interrompue, pour qu'un worker la reprenne via start(expected="queued")"""
+        self._merge(job_id, {}, status="queued")
+        return self.get(job_id)
+
+    def fail(self, job_id, error):
+        self._merge(job_id, {}, status="failed", error=str(error))
+        return self.get(job_id)
+
+    def finish(self, job_id):
+        self._merge(job_id, {}, status="done")
+        return self.get(job_id)
+
+    def cancel(self, job_id):
+        """Formation abandonnée (ex: interrompue avant le choix des exports) : jamais reprise automatiquement"""
+        self._merge(job_id, {}, status="cancelled")
+        return self.get(job_id)
+
+    def list(self, status=None, limit=50):
+        query = "SELECT id, prompt, options, stage, status, data, error, created_at, updated_at FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._job(row, []) for row in rows]
+
+    def unfinished(self):
+        """Formations interrompues (en cours lors d'un arrêt) ou en échec, des plus anciennes aux plus récentes"""
+        with self.lock:
+            ids = [row[0] for row in self.conn.execute(
+                "SELECT id FROM jobs WHERE status NOT IN ('done', 'cancelled') ORDER BY created_at"
+            ).fetchall()]
+        return [self.get(job_id) for job_id in ids]
+
+    def remove(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM stages WHERE job_id = ?", (job_id,))
+            removed = self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class CoursePipeline:
+    """Enchaîne les étapes d'une formation en les enregistrant dans le JobStore.
+
+    Chaque méthode d'étape ne fait rien si l'étape est déjà enregistrée : après un arrêt,
+    run() reprend à la première étape manquante (un rendu soumis est suivi, pas resoumis)."""
+
+    def __init__(self, store=None, generator=None, image_manager=None, video_backend=None, generation_mode=None):
+        self.store = store or JobStore()
+        self._generator = generator
+        self._image_manager = image_manager
+        self.video_backend = video_backend
+        self.generation_mode = generation_mode
+
+    @property
+    def image_manager(self):
+        if self._image_manager is None:
+            from image_manager import ImageManager
+            self._image_manager = ImageManager()
+        return self._image_manager
+
+    @property
+    def generator(self):
+        """ScriptGenerator créé au premier usage (le client Gemini n'est initialisé qu'une fois)"""
+        if self._generator is None:
+            from script_generator import ScriptGenerator
+            self._generator = ScriptGenerator(image_manager=self.image_manager, mode=self.generation_mode)
+        return self._generator
+
+    def create(self, prompt, **options):
+        job = self.store.create(prompt, options)
+        print(f"📒 Formation {job['id']} ({self.store.job_dir(job['id'])})")
+        return job
+
+    def script(self, job):
+        return self.store.read_json(job["id"], SCRIPT_FILE)
+
+    def generate(self, job, force_regenerate=False, resolve_images=True):
+        """Étape script (et images, résolues pendant la génération si resolve_images)"""
+        if "script" not in job["stages"]:
+            start = time.perf_counter()
+            script = self.generator.generate_training_script(job["prompt"], force_regenerate=force_regenerate,
+                                                             resolve_images=resolve_images)
+            self.store.write_json(job["id"], SCRIPT_FILE, script)
+            job = self.store.advance(job["id"], "script", time.perf_counter() - start,
+                                     llm_cache=self.generator.last_cache_status)
+            if resolve_images:
+                job = self.store.advance(job["id"], "images", 0)
+        return job
+
+    def resolve_images(self, job):
+        if "images" not in job["stages"]:
+            start = time.perf_counter()
+            script = self.image_manager.validate_and_fix_image_urls(self.script(job))
+            self.store.write_json(job["id"], SCRIPT_FILE, script)
+            job = self.store.advance(job["id"], "images", time.perf_counter() - start)
+        return job
+
+    def export(self, job, formats=None):
+        """Exports dans le dossier de la formation ; le JSON est ajouté quand la vidéo est demandée"""
+        if "exported" in job["stages"]:
+            return job
+        from exporters import export_script
+
+        if formats is not None:
+            job = self.store.update(job["id"], options={"formats": list(formats)})
+        formats = job["options"].get("formats")
+        formats = ["json"] if formats is None else list(formats)
+        if self.wants_video(job) and "json" not in formats:
+            formats.append("json")
+
+        if not formats:
+            # Script non sauvegardé (réponse « non » en mode interactif) : export_script exporterait tout
+            return self.store.advance(job["id"], "exported", 0, outputs={})
+        start = time.perf_counter()
+        exports = export_script(self.script(job), formats, stem=job["id"], folder=self.store.job_dir(job["id"]))
+        outputs = {}
+        for fmt, result in exports.items():
+            if not result["path"]:
+                raise Exception(f"Export {fmt} échoué: {result['error']}")
+            outputs[fmt] = result["path"]
+        return self.store.advance(job["id"], "exported", time.perf_counter() - start, outputs=outputs)
+
+    def wants_video(self, job):
+        # Par défaut, comme en mode interactif : vidéo dès que le JSON est exporté
+        video = job["options"].get("video")
+        formats = job["options"].get("formats")
+        return "json" in (["json"] if formats is None else formats) if video is None else bool(video)
+
+    def render(self, job):
+        """Étapes submitted puis downloaded : les IDs vidéo sont enregistrés dès la soumission"""
+        if "downloaded" in job["stages"]:
+            return job
+        from create_video_from_script import AVATAR_IDS, create_video_from_script
+
+        job_id = job["id"]
+        # Avatar choisi une fois pour toutes : une reprise doit soumettre les parties restantes avec le même
+        avatar = job["data"].get("avatar")
+        if not avatar:
+            avatar = random.choice(AVATAR_IDS)
+            job = self.store.update(job_id, avatar=avatar)
+
+        def submitted(video_ids):
+            if all(video_ids):
+                self.store.advance(job_id, "submitted", video_ids=video_ids)
+            else:
+                self.store.update(job_id, video_ids=video_ids)
+
+        start = time.perf_counter()
+        video = create_video_from_script(job["data"]["outputs"]["json"], backend=self.video_backend,
+                                         video_ids=job["data"].get("video_ids"), on_submit=submitted,
+                                         avatar=avatar)
+        if not video:
+            raise Exception("La création vidéo a échoué")
+        if not video.endswith(".mp4"):
+            # Rendu pas encore téléchargé : la reprise continuera le suivi du même ID
+            raise Exception(f"Vidéo non téléchargée, reprise possible: {video}")
+
+        video_path = self.store.artifact(job_id, "video.mp4")
+        shutil.move(video, video_path)
+        return self.store.advance(job_id, "downloaded", time.perf_counter() - start, video=video_path)
+
+    def subtitle(self, job):
+        if "subtitled" in job["stages"]:
+            return job
+        from video_subtitles import add_subtitles_to_video
+
+        start = time.perf_counter()
+        output = add_subtitles_to_video(job["data"]["video"], self.script(job),
+                                        output_path=self.store.artifact(job["id"], "video_sous_titres.mp4"))
+        return self.store.advance(job["id"], "subtitled", time.perf_counter() - start, video_subtitled=output)
+
+    @tracing.traced("job.run")
+    def run(self, job, force_regenerate=False):
+        """Exécute (ou reprend) toutes les étapes d'une formation ; renvoie la formation à jour"""
+        tracing.annotate(job=job["id"], stage=job["stage"])
+        if job["options"].get("awaiting_choice"):
+            # Mode interactif arrêté avant la réponse sur les exports : ne pas deviner formats ni vidéo
+            print(f"⏹️ [{job['id']}] Interrompue avant le choix des exports : formation annulée")
+            return self.store.cancel(job["id"])
+        try:
+            job = self.generate(job, force_regenerate=force_regenerate, resolve_images=False)
+            job = self.resolve_images(job)
+            job = self.export(job)
+            if self.wants_video(job):
+                job = self.render(job)
+                job = self.subtitle(job)
+            return self.store.finish(job["id"])
+        except Exception as e:
+            print(f"❌ [{job['id']}] {e}")
+            return self.store.fail(job["id"], e)
+
+
+def print_job(job):
+    stages = " > ".join(name for name in STAGES if name in job["stages"]) or "-"
+    created = datetime.fromtimestamp(job["created_at"]).strftime("%Y-%m-%d %H:%M")
+    print(f"📒 {job['id']} [{job['status']}] {created} | {stages} | {job['prompt'][:60]}")
+    if job["error"]:
+        print(f"   ❌ {job['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suivi et reprise des formations interrompues")
+    parser.add_argument("--root", default=None, help=f"Dossier des formations (défaut: {DEFAULT_JOBS_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = sub.add_parser("list", help="Formations les plus récentes")
+    list_parser.add_argument("--status", choices=["queued", "running", "failed", "done", "cancelled"])
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    show_parser = sub.add_parser("show", help="Détail d'une formation")
+    show_parser.add_argument("job_id")
+
+    resume_parser = sub.add_parser("resume", help="Reprendre des formations à leur dernière étape terminée")
+    resume_parser.add_argument("job_ids", nargs="*",
+                               help="Formations à reprendre (défaut: les interrompues ou en échec, hors formations en cours)")
+    resume_parser.add_argument("--resubmit", action="store_true",
+                               help="Oublier les IDs vidéo enregistrés et soumettre un nouveau rendu")
+    resume_parser.add_argument("--video-backend", choices=["synthesia", "local"])
+
+    remove_parser = sub.add_parser("remove", help="Supprimer des formations et leurs artefacts")
+    remove_parser.add_argument("job_ids", nargs="+")
+
+    args = parser.parse_args()
+    store = JobStore(args.root)
+
+    if args.command == "list":
+        jobs = store.list(args.status, args.limit)
+        if not jobs:
+            print("📭 Aucune formation")
+        for job in jobs:
+            print_job(store.get(job["id"]))
+    elif args.command == "show":
+        job = store.get(args.job_id)
+        if job is None:
+            print(f"❌ Formation inconnue: {args.job_id}")
+        else:
+            print(json.dumps(job, ensure_ascii=False, indent=2))
+    elif args.command == "resume":
+        if args.job_ids:
+            jobs = [store.get(job_id) for job_id in args.job_ids]
+        else:
+            # Une formation "running" est peut-être encore traitée (main.py dans un autre terminal, service)
+            # et les demandes en file appartiennent au service : à nommer explicitement pour les reprendre
+            jobs = store.unfinished()
+            owned = [job for job in jobs if job["status"] == "running"
+                     or (job["options"].get("service") and job["status"] == "queued")]
+            if owned:
+                print(f"⏭️ {len(owned)} formation(s) en cours ou en file ignorée(s) (à nommer pour les reprendre ici)")
+            jobs = [job for job in jobs if job not in owned]
+        jobs = [job for job in jobs if job and job["status"] not in ("done", "cancelled")]
+        if not jobs:
+            print("✅ Aucune formation à reprendre")
+        pipeline = CoursePipeline(store, video_backend=args.video_backend)
+        for job in jobs:
+            # Prise en charge atomique des formations en file ou en échec ; une formation "running"
+            # n'arrive ici que nommée explicitement (reprise forcée après un arrêt brutal)
+            claimed = store.start(job["id"], expected=job["status"])
+            if claimed is None:
+                print(f"⏭️ {job['id']} déjà prise en charge ailleurs")
+                continue
+            job = claimed
+            if args.resubmit and job["data"].get("video_ids"):
+                job = store.update(job["id"], video_ids=None)
+            print(f"🔁 Reprise de {job['id']} après l'étape {job['stage'] or 'aucune'}")
+            print_job(pipeline.run(job))
+    elif args.command == "remove":
+        for job_id in args.job_ids:
+            print(f"🧹 {job_id}: {'supprimée' if store.remove(job_id) else 'inconnue'}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import csv
+import json
+import glob
+import threading
+import unicodedata
+from collections import deque
+
+
+def normalize(text):
+    """Minuscules sans accents ni ponctuation, pluriels simples ramenés au singulier"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char if char.isalnum() else " " for char in text if not unicodedata.combining(char))
+    words = []
+    for word in text.split():
+        if len(word) > 3 and word[-1] in "sx":
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+class KeywordIndex:
+    """Automate Aho-Corasick sur mots entiers : toutes les occurrences de tous les mots-clés
+    en une seule passe sur le texte, quelle que soit la taille du vocabulaire"""
+
+    def __init__(self, entries=None):
+        self._entries = {}
+        self._automaton = None
+        self._lock = threading.Lock()
+        for keyword, value in (entries or {}).items():
+            self.add(keyword, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, keyword, value, weight=1.0):
+        normalized = normalize(keyword)
+        if not normalized:
+            return
+        with self._lock:
+            self._entries[normalized] = (keyword, value, weight, len(self._entries))
+            self._automaton = None
+
+    def _build(self):
+        goto, fail, output = [{}], [0], [[]]
+        for normalized in self._entries:
+            # Les espaces autour du motif imposent des limites de mots
+            pattern = f" {normalized} "
+            state = 0
+            for char in pattern:
+                following = goto[state].get(char)
+                if following is None:
+                    following = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                    goto[state][char] = following
+                state = following
+            output[state].append((len(pattern), normalized))
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in goto[state].items():
+                queue.append(following)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[following] = goto[fallback].get(char, 0)
+                output[following] = output[following] + output[fail[following]]
+        return goto, fail, output, dict(self._entries)
+
+    def _compiled(self):
+        automaton = self._automaton
+        if automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._automaton = self._build()
+                automaton = self._automaton
+        return automaton
+
+    def find(self, text):
+        """Toutes les occurrences : liste de (position, mot-clé, valeur, poids)"""
+        goto, fail, output, entries = self._compiled()
+        state = 0
+        matches = []
+        for i, char in enumerate(f" {normalize(text)} "):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, normalized in output[state]:
+                keyword, value, weight, _ = entries[normalized]
+                matches.append((i - length + 1, keyword, value, weight))
+        return matches
+
+    def rank(self, text):
+        """Valeurs trouvées, de la plus pertinente à la moins pertinente.
+
+        Le score d'une valeur cumule poids x nombre de mots de chaque mot-clé trouvé (un mot-clé
+        long est plus précis) ; à score égal, la première apparue dans le texte l'emporte."""
+        _, _, _, entries = self._compiled()
+        scores = {}
+        for position, keyword, value, weight in self.find(text):
+            score, first, order = scores.get(value, (0.0, position, entries[normalize(keyword)][3]))
+            scores[value] = (score + weight * len(normalize(keyword).split()), min(first, position), order)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1][0], item[1][1], item[1][2]))
+        return [(value, score) for value, (score, _, _) in ranked]
+
+    def best(self, text, default=None):
+        ranked = self.rank(text)
+        return ranked[0][0] if ranked else default
+
+
+def load_keyword_file(path):
+    """Lit un fichier de vocabulaire métier.
+
+    .json : {"search_terms": {mot-clé: terme ou {"term", "weight"}}, "fallback_urls": {catégorie: url}} ;
+    .tsv/.txt/.csv : une ligne par mot-clé, "mot-clé<TAB>terme de recherche[<TAB>poids]"."""
+    search_terms, fallback_urls = [], []
+    if path.lower().endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for keyword, term in data.get("search_terms", {}).items():
+            if isinstance(term, dict):
+                search_terms.append((keyword, term["term"], float(term.get("weight", 1.0))))
+            else:
+                search_terms.append((keyword, term, 1.0))
+        fallback_urls = list(data.get("fallback_urls", {}).items())
+    else:
+        delimiter = "," if path.lower().endswith(".csv") else "\t"
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                if len(row) < 2 or row[0].startswith("#"):
+                    continue
+                weight = float(row[2]) if len(row) > 2 and row[2].strip() else 1.0
+                search_terms.append((row[0].strip(), row[1].strip(), weight))
+    return search_terms, fallback_urls
+
+
+def keyword_files():
+    """Fichiers listés dans IMAGE_KEYWORD_FILES, sinon tout le dossier keywords/ s'il existe"""
+    configured = os.getenv("IMAGE_KEYWORD_FILES")
+    if configured:
+        return [path.strip() for path in configured.split(",") if path.strip()]
+    return sorted(path for pattern in ("*.json", "*.tsv", "*.txt", "*.csv")
+                  for path in glob.glob(os.path.join("keywords", pattern)))
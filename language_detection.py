@@ -0,0 +1,85 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+import tracing
+
+DEFAULT_LANGUAGE = "fr"
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "1024"))
+# Au-delà, le texte n'apporte plus rien à la détection et alourdit la clé du cache
+MAX_SAMPLE_CHARS = 2000
+
+# Repli quand langdetect est absent ou ne trouve aucun indice (texte vide, chiffres seuls...)
+KEYWORDS = {
+    "fr": ['formation', 'cours', 'apprentissage', 'développement', 'compétences', 'savoir'],
+    "en": ['training', 'course', 'learning', 'development', 'skills', 'knowledge', 'understanding'],
+}
+
+_factory_lock = threading.Lock()
+_factory_ready = False
+
+
+def warm_up():
+    """Charge les profils langdetect une seule fois, avec une graine fixe (résultats reproductibles).
+
+    langdetect échoue si plusieurs threads chargent ses profils en même temps : tout passe par ici."""
+    global _factory_ready
+    if _factory_ready:
+        return True
+    with _factory_lock:
+        if not _factory_ready:
+            try:
+                from langdetect import DetectorFactory
+                from langdetect.detector_factory import init_factory
+            except ImportError:
+                return False
+            with tracing.span("language.warm_up"):
+                DetectorFactory.seed = 0
+                init_factory()
+            _factory_ready = True
+    return True
+
+
+def warm_up_in_background():
+    """Lance le chargement des profils sans retarder le démarrage"""
+    thread = threading.Thread(target=warm_up, name="language-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def keyword_language(text, default=DEFAULT_LANGUAGE):
+    """Ancienne détection par mots-clés, gardée en repli"""
+    sample_lower = text.lower()
+    scores = {language: sum(1 for word in words if word in sample_lower) for language, words in KEYWORDS.items()}
+    if scores["en"] > scores["fr"]:
+        return "en"
+    return "fr" if scores["fr"] else default
+
+
+def _sample(text):
+    return re.sub(r"\s+", " ", text or "").strip()[:MAX_SAMPLE_CHARS]
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def _detect(sample, default):
+    if sample and warm_up():
+        from langdetect.detector_factory import _factory
+        from langdetect.lang_detect_exception import LangDetectException
+
+        try:
+            detector = _factory.create()
+            detector.append(sample)
+            return detector.detect()
+        except LangDetectException:
+            pass
+    return keyword_language(sample, default)
+
+
+def detect_language(text, default=DEFAULT_LANGUAGE):
+    """Code ISO 639-1 de la langue du texte ("fr", "en"...), mémorisé pour les textes déjà vus"""
+    return _detect(_sample(text), default)
+
+
+def cache_info():
+    return _detect.cache_info()
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import textwrap
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from dotenv import load_dotenv
+
+import http_client
+import tracing
+from asset_store import get_store, cover_resize
+from ffmpeg_utils import concat_files
+
+load_dotenv()
+
+WIDTH = int(os.getenv("LOCAL_RENDER_WIDTH", "1280"))
+HEIGHT = int(os.getenv("LOCAL_RENDER_HEIGHT", "720"))
+FPS = int(os.getenv("LOCAL_RENDER_FPS", "24"))
+WORKERS = int(os.getenv("LOCAL_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+# Débit de lecture de la voix off (~150 mots/minute) pour estimer la durée d'une scène
+WORDS_PER_SECOND = float(os.getenv("LOCAL_RENDER_WORDS_PER_SECOND", "2.5"))
+MIN_SCENE_SECONDS = float(os.getenv("LOCAL_RENDER_MIN_SCENE_SECONDS", "3"))
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/Library/Fonts/Arial Bold.ttf",
+    "C:\\Windows\\Fonts\\arialbd.ttf",
+]
+BACKGROUND_COLOR = (24, 32, 48)
+
+
+def scene_duration(scene):
+    """Durée d'une scène en secondes, déduite de la longueur de sa voix off"""
+    words = len(scene.get('voix_off', '').split())
+    return max(MIN_SCENE_SECONDS, round(words / WORDS_PER_SECOND, 2))
+
+
+def load_font(size):
+    for path in FONT_PATHS:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def load_background(url, size, asset=None):
+    """Image de fond recadrée à la taille de la vidéo, ou fond uni si l'image est indisponible.
+
+    asset : hash de l'image dans le magasin local, relue sur disque sans téléchargement"""
+    if os.getenv("ASSET_STORE", "1") != "0":
+        try:
+            store = get_store()
+            if not (asset and store.path(asset)) and url and url.startswith("http"):
+                asset = store.fetch(url)
+            # Variante déjà recadrée à la taille de la vidéo, conservée pour les rendus suivants
+            path = store.variant(asset, *size) if asset else None
+            if path:
+                with Image.open(path) as image:
+                    return image.convert("RGB")
+        except Exception as e:
+            print(f"⚠️ Image locale indisponible ({url}): {e}")
+    if url and url.startswith("http"):
+        try:
+            response = http_client.get(url, timeout=(5, 20))
+            if response.status_code == 200:
+                image = Image.open(BytesIO(response.content)).convert("RGB")
+                return cover_resize(image, size)
+        except Exception as e:
+            print(f"⚠️ Image de fond indisponible ({url}): {e}")
+    return Image.new("RGB", size, BACKGROUND_COLOR)
+
+
+def compose_frame(scene, size=(WIDTH, HEIGHT)):
+    """Image fixe d'une scène : fond, bandeau assombri, titre et points clés"""
+    frame = load_background(scene.get('elements_visuels', ''), size, scene.get('image_asset'))
+    width, height = size
+
+    title_font = load_font(max(16, height // 18))
+    point_font = load_font(max(14, height // 26))
+    margin = width // 16
+    chars_per_line = max(20, int((width - 2 * margin) / (point_font.size * 0.55)))
+
+    lines = [(textwrap.fill(f"{scene.get('numero', '')}. {scene.get('titre', '')}", chars_per_line), title_font)]
+    for point in scene.get('points_cles', []):
+        lines.append((textwrap.fill(f"• {point}", chars_per_line), point_font))
+
+    line_gap = height // 40
+    block_height = sum((text.count("\n") + 1) * int(font.size * 1.25) + line_gap for text, font in lines)
+    top = max(0, height - block_height - margin)
+
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).rectangle((0, top - line_gap, width, height), fill=(0, 0, 0, 150))
+    frame = Image.alpha_composite(frame.convert("RGBA"), overlay).convert("RGB")
+
+    draw = ImageDraw.Draw(frame)
+    y = top
+    for text, font in lines:
+        draw.multiline_text((margin, y), text, font=font, fill=(255, 255, 255), spacing=int(font.size * 0.25))
+        y += (text.count("\n") + 1) * int(font.size * 1.25) + line_gap
+    return frame
+
+
+def render_scene(scene, output_path, size=(WIDTH, HEIGHT), fps=FPS):
+    """Encode une scène en MP4 muet ; appelée dans un processus du pool"""
+    from moviepy.video.VideoClip import ImageClip
+
+    # Durée passée au constructeur : set_duration (moviepy 1.x) est devenu with_duration en 2.x
+    clip = ImageClip(np.asarray(compose_frame(scene, size)), duration=scene_duration(scene))
+    # Un thread d'encodage par processus : le parallélisme vient du nombre de scènes
+    clip.write_videofile(output_path, fps=fps, codec="libx264", audio=False, preset="veryfast",
+                         threads=1, logger=None)
+    clip.close()
+    return output_path
+
+
+@tracing.traced("video.render_local")
+def render_script(script_data, output_path, workers=None, size=(WIDTH, HEIGHT), fps=FPS):
+    """Rend toutes les scènes en parallèle puis les assemble sans réencodage"""
+    scenes = script_data.get('scenes', [])
+    if not scenes:
+        raise ValueError("❌ Aucune scène à rendre")
+    workers = max(1, min(workers or WORKERS, len(scenes)))
+
+    print(f"🎞️ Rendu local de {len(scenes)} scènes sur {workers} processus...")
+    start = time.perf_counter()
+    work_dir = tempfile.mkdtemp(prefix="rendu_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        paths = [os.path.join(work_dir, f"scene_{i:04d}.mp4") for i in range(len(scenes))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_scene, scene, path, size, fps) for scene, path in zip(scenes, paths)]
+            for future in futures:
+                future.result()
+        rendered = time.perf_counter() - start
+
+        concat_files(paths, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    total = sum(scene_duration(scene) for scene in scenes)
+    print(f"✅ Vidéo locale ({total:.0f}s) créée en {time.perf_counter() - start:.1f}s "
+          f"(scènes: {rendered:.1f}s) : {output_path}")
+    return output_path
+
+
+def render_script_file(json_file_path, output_path=None, workers=None):
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        script_data = json.load(f)
+    if output_path is None:
+        output_path = os.path.join("videos", os.path.splitext(os.path.basename(json_file_path))[0] + ".mp4")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    return render_script(script_data, output_path, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendu vidéo local d'un script de formation (sans Synthesia)")
+    parser.add_argument("script", help="Fichier JSON du script")
+    parser.add_argument("-o", "--output", help="Fichier MP4 de sortie (défaut: videos/<script>.mp4)")
+    parser.add_argument("--workers", type=int, help=f"Processus de rendu (défaut: {WORKERS})")
+    args = parser.parse_args()
+    try:
+        render_script_file(args.script, args.output, args.workers)
+    except Exception as e:
+        print(f"❌ Rendu local échoué: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
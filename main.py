@@ -1,9 +1,18 @@
-from create_video_from_script import create_video_from_script
-from script_generator import ScriptGenerator
-from video_subtitles import add_subtitles_to_video  # Ta fonction d'ajout sous-titres importée
+import argparse
+from create_video_from_script import VIDEO_BACKEND
+from script_generator import ScriptGenerator, GENERATION_MODES
+import http_client
+import tracing
+import language_detection
+from exporters import available_formats
+from job_store import CoursePipeline
 
-def main():
-    generator = ScriptGenerator()
+def main(force_regenerate=False, generation_mode=None):
+    generator = ScriptGenerator(mode=generation_mode)
+    # Chaque étape est enregistrée : une formation interrompue se reprend sans tout refaire
+    pipeline = CoursePipeline(generator=generator, image_manager=generator.image_manager)
+    # Profils de langue chargés pendant que l'utilisateur saisit sa demande
+    language_detection.warm_up_in_background()
     print("🎓 GÉNÉRATEUR DE SCRIPT DE FORMATION IA")
     print("="*50)
 
@@ -19,7 +28,12 @@ def main():
     for i, exemple in enumerate(exemples, 1):
         print(f"   {i}. {exemple}")
 
+    unfinished = pipeline.store.unfinished()
+    if unfinished:
+        print(f"\n🔁 {len(unfinished)} formation(s) inachevée(s) : python job_store.py resume")
+
     while True:
+        job = None
         try:
             user_input = input("\n💬 Entrez votre demande de formation (ou 'quit'): ").strip()
             if user_input.lower() in ['quit', 'exit', 'q']:
@@ -31,49 +45,79 @@ def main():
                 continue
 
             # Générer le script JSON
-            script = generator.generate_training_script(user_input)
+            # Formats et vidéo ne sont connus qu'après la question ci-dessous
+            job = pipeline.create(user_input, awaiting_choice=True)
+            job = pipeline.generate(job, force_regenerate=force_regenerate)
+            script = pipeline.script(job)
             generator.display_script_summary(script)
 
             save = input("\n💾 Voulez-vous sauvegarder ce script ? (JSON=j, PDF=p, PPT=t, Tous=a, Non=n): ").strip().lower()
 
             filename_json = None
+            formats = None
 
             if save in ['j', 'json']:
-                filename_json = generator.save_script_to_file(script)
+                formats = ['json']
             elif save in ['p', 'pdf']:
-                generator.json_to_pdf(script)
+                formats = ['pdf']
             elif save in ['t', 'ppt']:
-                generator.json_to_ppt(script)
+                formats = ['ppt']
             elif save in ['a', 'tous', 'all']:
-                filename_json = generator.save_script_to_file(script)
-                generator.json_to_pdf(script)
-                generator.json_to_ppt(script)
+                formats = available_formats()
             elif save not in ['n', 'non', 'no']:
                 print("Option non reconnue. Script non sauvegardé.")
+            job = pipeline.store.update(job["id"], options={"formats": formats or [], "awaiting_choice": False})
+
+            if formats:
+                # Tous les formats partagent le même nom de base et sont rendus en parallèle,
+                # dans le dossier de la formation
+                job = pipeline.export(job, formats)
+                filename_json = job["data"]["outputs"].get('json')
 
-            # Si JSON sauvegardé, on lance la création vidéo Synthesia
+            # Si JSON sauvegardé, on lance la création vidéo (Synthesia ou rendu local)
             if filename_json:
-                print("\n🚀 Lancement de la création vidéo sur Synthesia...")
-                video_file_or_url = create_video_from_script(filename_json)
+                moteur = "en local" if VIDEO_BACKEND == "local" else "sur Synthesia"
+                print(f"\n🚀 Lancement de la création vidéo {moteur}...")
+                # L'ID vidéo est enregistré dès la soumission : une interruption ne relance pas le rendu
+                job = pipeline.render(job)
+                print(f"🎬 Vidéo téléchargée localement : {job['data']['video']}")
+                # Ajouter les sous-titres à la vidéo locale
+                job = pipeline.subtitle(job)
+                print(f"✅ Vidéo finale avec sous-titres prête : {job['data']['video_subtitled']}")
+            pipeline.store.finish(job["id"])
 
-                if video_file_or_url:
-                    # Vérifier si on a un fichier vidéo local (.mp4)
-                    if video_file_or_url.endswith(".mp4"):
-                        print(f"🎬 Vidéo téléchargée localement : {video_file_or_url}")
-                        # Ajouter les sous-titres à la vidéo locale
-                        final_video = add_subtitles_to_video(video_file_or_url, script, output_path="video_finale_avec_sous_titres.mp4")
-                        print(f"✅ Vidéo finale avec sous-titres prête : {final_video}")
-                    else:
-                        print(f"🎬 Vidéo créée mais non téléchargée localement, URL : {video_file_or_url}")
-                else:
-                    print("❌ La création vidéo a échoué.")
+            http_client.print_stats()
+            if tracing.is_enabled():
+                tracing.print_summary()
+                tracing.save()
 
         except KeyboardInterrupt:
             print("\n👋 Interruption. À bientôt!")
+            if job and job["options"].get("awaiting_choice"):
+                pipeline.store.cancel(job["id"])
+            elif job:
+                # Plus "running" : `job_store.py resume` sans argument pourra la reprendre
+                pipeline.store.fail(job["id"], "interrompue")
+                print(f"🔁 Reprise possible : python job_store.py resume {job['id']}")
             break
         except Exception as e:
             print(f"❌ Erreur: {e}")
+            if job:
+                job = pipeline.store.fail(job["id"], e)
+                if not job["options"].get("awaiting_choice"):
+                    print(f"🔁 Reprise possible : python job_store.py resume {job['id']}")
             print("🔄 Veuillez réessayer")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Générateur de script de formation IA")
+    parser.add_argument("--force-regenerate", action="store_true",
+                        help="Ignorer le cache LLM et régénérer chaque script")
+    parser.add_argument("--trace", action="store_true",
+                        help="Enregistrer une trace Chrome de chaque formation dans traces/")
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES,
+                        help="single : script en une réponse ; outline : plan puis scènes en parallèle "
+                             "(défaut: GEMINI_GENERATION_MODE ou single)")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+    main(force_regenerate=args.force_regenerate, generation_mode=args.generation_mode)
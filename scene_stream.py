@@ -0,0 +1,89 @@
+import json
+
+
+class IncrementalSceneParser:
+    """Parse le JSON du script au fil du flux et renvoie chaque scène dès que son objet est fermé"""
+
+    def __init__(self, array_key="scenes"):
+        self.array_key = array_key
+        self.text = ""
+        self.position = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None
+        self.pending_key = None
+        self.array_depth = None
+        self.item_start = None
+        self.scene_count = 0
+        # Tous les objets du tableau dans l'ordre, None pour ceux dont le JSON est illisible
+        self.items = []
+
+    def feed(self, chunk):
+        """Ajoute un morceau de texte et renvoie la liste des scènes complètes qu'il termine"""
+        self.text += chunk
+        scenes = []
+        text = self.text
+
+        for i in range(self.position, len(text)):
+            char = text[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start + 1:i]
+                continue
+
+            if not self.started:
+                # Ignorer le texte et les marqueurs markdown avant le JSON
+                if char != '{':
+                    continue
+                self.started = True
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char == ':':
+                # Une clé de l'objet racine vient d'être lue
+                self.pending_key = self.last_string if self.depth == 1 else None
+            elif char in '{[':
+                self.depth += 1
+                if char == '[' and self.pending_key == self.array_key and self.array_depth is None:
+                    self.array_depth = self.depth
+                elif char == '{' and self.array_depth is not None and self.depth == self.array_depth + 1:
+                    self.item_start = i
+                self.pending_key = None
+            elif char in '}]':
+                if char == '}' and self.item_start is not None and self.depth == self.array_depth + 1:
+                    scene = self._parse_item(text[self.item_start:i + 1])
+                    if scene is not None:
+                        scenes.append(scene)
+                    self.item_start = None
+                elif char == ']' and self.depth == self.array_depth:
+                    self.array_depth = None
+                self.depth -= 1
+            elif char == ',':
+                self.pending_key = None
+
+        self.position = len(text)
+        return scenes
+
+    @property
+    def broken_count(self):
+        return len(self.items) - self.scene_count
+
+    def _parse_item(self, raw):
+        try:
+            scene = json.loads(raw)
+        except json.JSONDecodeError:
+            self.items.append(None)
+            return None
+        self.items.append(scene)
+        self.scene_count += 1
+        return scene
@@ -1,37 +1,115 @@
 import os
+import copy
 import json
-from datetime import datetime
+import time
+import hashlib
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
 
 from dotenv import load_dotenv
-import google.generativeai as genai
-from fpdf import FPDF
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from create_video_from_script import create_video_from_script
+import exporters
+import tracing
 import re
-from langdetect import detect
 from image_manager import ImageManager
+from scene_stream import IncrementalSceneParser
+from script_schema import SCRIPT_SCHEMA, SCENE_SCHEMA, OUTLINE_SCHEMA, validate_scene, validate_outline
+from cache_store import CacheStore
+from language_detection import detect_language
 
 load_dotenv()
 
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+# Réparation des scènes invalides : nouvelles demandes par scène et appels Gemini en parallèle
+SCENE_REPAIR_ATTEMPTS = int(os.getenv("SCENE_REPAIR_ATTEMPTS", "2"))
+SCENE_REPAIR_WORKERS = int(os.getenv("SCENE_REPAIR_WORKERS", "4"))
+# Mode "outline" : plan court puis rédaction des scènes en parallèle, GEMINI_SCENE_WORKERS appels à la fois
+GENERATION_MODES = ["single", "outline"]
+GEMINI_SCENE_WORKERS = int(os.getenv("GEMINI_SCENE_WORKERS", "6"))
+
+OUTLINE_PROMPTS = {
+    'fr': """
+Tu es un expert en création de contenu de formation professionnelle.
+À partir d'une demande de formation, rédige uniquement le PLAN de la formation : 8 à 12 scènes
+(introduction, bases, concepts intermédiaires et avancés, applications pratiques, conclusion).
+Pour chaque scène, donne un titre et un résumé de 1 à 2 phrases de ce qu'elle doit couvrir.
+
+Réponds UNIQUEMENT avec un JSON valide dans ce format exact:
+{
+  "titre_formation": "Titre complet et accrocheur",
+  "description": "Description détaillée de la formation",
+  "duree_estimee": "Durée estimée",
+  "niveau": "Niveau",
+  "objectifs": ["Objectif 1", "Objectif 2", "Objectif 3", "Objectif 4"],
+  "scenes": [{"numero": 1, "titre": "Titre de la scène", "resume": "Ce que la scène doit couvrir"}]
+}
+""",
+    'en': """
+You are an expert in professional training content creation.
+Given a training request, write only the OUTLINE of the training: 8 to 12 scenes
+(introduction, basics, intermediate and advanced concepts, practical applications, conclusion).
+For each scene, give a title and a 1-2 sentence summary of what it must cover.
+
+Respond ONLY with a valid JSON in this exact format:
+{
+  "titre_formation": "Full and catchy training title",
+  "description": "Detailed training description",
+  "duree_estimee": "Estimated duration",
+  "niveau": "Level",
+  "objectifs": ["Objective 1", "Objective 2", "Objective 3", "Objective 4"],
+  "scenes": [{"numero": 1, "titre": "Scene title", "resume": "What the scene must cover"}]
+}
+""",
+}
+
 class ScriptGenerator:
-    def __init__(self):
+    def __init__(self, stream=None, llm_cache=None, image_manager=None, mode=None):
         print("🔍 Chargement de la clé Gemini...")
         self.api_key = os.getenv("GEMINI_API_KEY")
 
         if not self.api_key:
             raise Exception("❌ GEMINI_API_KEY non trouvée dans .env")
 
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
-        # Initialiser le gestionnaire d'images
-        self.image_manager = ImageManager()
-
-    def generate_training_script(self, user_prompt):
+        self.model_name = "gemini-1.5-flash"
+        self.generation_config = {"temperature": 0.7}
+        # Sortie JSON contrainte par le schéma du script (GEMINI_JSON_SCHEMA=0 : texte libre)
+        self.json_schema = os.getenv("GEMINI_JSON_SCHEMA", "1") != "0"
+        if self.json_schema:
+            self.generation_config.update(response_mime_type="application/json", response_schema=SCRIPT_SCHEMA)
+        self._model = None
+        # Initialiser le gestionnaire d'images (partageable entre générateurs)
+        self.image_manager = image_manager or ImageManager()
+        # Streaming : les images des premières scènes sont cherchées pendant la génération
+        if stream is None:
+            stream = os.getenv("GEMINI_STREAM", "1") != "0"
+        self.stream = stream
+        # "single" : tout le script en une réponse ; "outline" : plan puis scènes rédigées en parallèle
+        self.mode = mode or os.getenv("GEMINI_GENERATION_MODE", "single")
+        if self.mode not in GENERATION_MODES:
+            raise ValueError(f"❌ Mode de génération inconnu: {self.mode} (choix: {', '.join(GENERATION_MODES)})")
+        # Cache des réponses Gemini (llm_cache=False pour le désactiver)
+        if llm_cache is None and os.getenv("LLM_CACHE", "1") != "0":
+            llm_cache = CacheStore(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+        self.llm_cache = llm_cache or None
+        self.last_cache_status = None
+
+    @property
+    def model(self):
+        """Modèle Gemini créé au premier appel : le SDK n'est importé que si une génération a lieu"""
+        if self._model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @tracing.traced("generate_training_script")
+    def generate_training_script(self, user_prompt, force_regenerate=False, resolve_images=True):
         # Détection de la langue de l'utilisateur
-        lang = detect(user_prompt)
+        lang = detect_language(user_prompt)
         print(f"🌐 Langue détectée: {lang}")
+        tracing.annotate(language=lang, prompt_chars=len(user_prompt))
 
         if lang == 'en':
             system_prompt = """
@@ -112,42 +190,299 @@ Réponds UNIQUEMENT avec un JSON valide dans ce format exact:
         # Combiner le system prompt avec la demande utilisateur
         full_prompt = f"{system_prompt}\n\nDemande de formation: {user_prompt}"
         
+        cache_key = self._script_cache_key(user_prompt, 'en' if lang == 'en' else 'fr')
+        script_data = None
+        content = None
+        if self.llm_cache and not force_regenerate:
+            found, cached = self.llm_cache.lookup("script", cache_key)
+            if found and cached:
+                script_data = cached["script"]
+
+        if script_data is not None:
+            self.last_cache_status = "hit"
+        else:
+            self.last_cache_status = "bypass" if force_regenerate else "miss"
+        print(f"💾 Cache LLM: {self.last_cache_status.upper()} ({cache_key[:12]})")
+        tracing.annotate(cache=self.last_cache_status)
+
+        image_executor = None
+        prefetched = []
+        try:
+            if script_data is None:
+                if resolve_images and (self.stream or self.mode == "outline"):
+                    image_executor = ThreadPoolExecutor(max_workers=self.image_manager.max_workers)
+                if self.mode == "outline":
+                    script_data, content = self._generate_from_outline(user_prompt, lang, image_executor, prefetched)
+                elif self.stream:
+                    content = self._generate_streaming(full_prompt, image_executor, prefetched)
+                    print(f"📏 Longueur de la réponse: {len(content)} caractères")
+                else:
+                    with tracing.span("gemini.generate", stream=False) as current:
+                        response = self.model.generate_content(
+                            full_prompt,
+                            generation_config=self.generation_config
+                        )
+
+                        content = response.text.strip()
+                        current.set(chars=len(content))
+
+                    print(f"📏 Longueur de la réponse: {len(content)} caractères")
+
+                if script_data is None:
+                    script_data = self._parse_script(content)
+                self._repair_broken_scenes(script_data, lang)
+
+            # Langue détectée une fois pour toutes : intro, sous-titres et exports la relisent dans le JSON
+            script_data['langue'] = lang
+
+            # Le cache garde le script tel que généré, avant attribution des images
+            generated_script = copy.deepcopy(script_data)
+
+            # Valider et corriger les URLs d'images avec le gestionnaire d'images
+            if resolve_images:
+                script_data = self.image_manager.validate_and_fix_image_urls(script_data, prefetched=prefetched)
+        finally:
+            if image_executor:
+                image_executor.shutdown(wait=False, cancel_futures=True)
+
+        self._validate_script_structure(script_data, check_urls=resolve_images)
+        if content is not None and self.llm_cache:
+            self.llm_cache.set("script", cache_key, {"raw": content, "script": generated_script}, LLM_CACHE_TTL)
+        print("✅ Script généré avec succès!")
+        return script_data
+
+    def _script_cache_key(self, user_prompt, language):
+        """Empreinte du prompt normalisé, de la branche de langue, du modèle et de la config"""
+        normalized = " ".join(unicodedata.normalize("NFC", user_prompt).casefold().split())
+        key_data = {
+            "prompt": normalized,
+            "language": language,
+            "model": self.model_name,
+            "generation_config": self.generation_config,
+        }
+        # Le mode historique garde ses clés : les scripts déjà en cache restent valides
+        if self.mode != "single":
+            key_data["mode"] = self.mode
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @tracing.traced("gemini.generate")
+    def _generate_streaming(self, full_prompt, image_executor, prefetched):
+        """Consomme la réponse Gemini morceau par morceau et lance la recherche d'image
+        de chaque scène dès que son objet JSON est complet"""
+        parser = IncrementalSceneParser()
+        start = time.time()
+        prefetch_enabled = True
+
         response = self.model.generate_content(
             full_prompt,
-            generation_config={"temperature": 0.7}
+            generation_config=self.generation_config,
+            stream=True
         )
-
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Morceau sans texte (fin de flux, métadonnées)
+                continue
+
+            for scene in parser.feed(text):
+                if parser.scene_count == 1:
+                    print(f"⏱️ Première scène reçue après {time.time() - start:.1f}s")
+                    tracing.annotate(first_scene_seconds=round(time.time() - start, 3))
+                print(f"🎬 Scène {scene.get('numero', parser.scene_count)} reçue: {scene.get('titre', '')}")
+
+                # Les futures doivent correspondre aux premières scènes, dans l'ordre : une scène
+                # illisible ou invalide sera réparée, la recherche d'images s'arrête avant elle
+                if parser.broken_count or validate_scene(scene):
+                    prefetch_enabled = False
+                if image_executor and prefetch_enabled:
+                    prefetched.append(image_executor.submit(self.image_manager.resolve_scene_image, scene))
+                else:
+                    prefetch_enabled = False
+
+        print(f"✅ Génération terminée en {time.time() - start:.1f}s ({parser.scene_count} scènes)")
+        tracing.annotate(stream=True, chars=len(parser.text), scenes=parser.scene_count)
+        return parser.text.strip()
+
+    @tracing.traced("gemini.outline")
+    def _generate_outline(self, user_prompt, language):
+        """Premier appel, court : titre, description, objectifs et plan des scènes"""
+        prompt = f"{OUTLINE_PROMPTS['en' if language == 'en' else 'fr']}\n\nDemande de formation: {user_prompt}"
+        generation_config = dict(self.generation_config)
+        if self.json_schema:
+            generation_config["response_schema"] = OUTLINE_SCHEMA
+
+        start = time.time()
+        response = self.model.generate_content(prompt, generation_config=generation_config)
         content = response.text.strip()
-        
-        # DEBUG : Afficher la réponse brute pour voir ce qui est retourné
-        print("🔍 DEBUG - Réponse de l'API:")
-        print("=" * 50)
-        print(content)  # Afficher TOUTE la réponse pour voir ce qui se passe
-        print("=" * 50)
-        print(f"📏 Longueur de la réponse: {len(content)} caractères")
-        
-        # Essayer d'extraire le JSON de la réponse
+        tracing.annotate(chars=len(content))
+        try:
+            outline = json.loads(self._extract_json_from_response(content))
+        except json.JSONDecodeError as e:
+            raise Exception(f"Erreur de parsing JSON du plan: {e}")
+        errors = validate_outline(outline)
+        if errors:
+            raise ValueError(f"Plan invalide: {'; '.join(errors[:5])}")
+        print(f"🗂️ Plan reçu en {time.time() - start:.1f}s: {len(outline['scenes'])} scènes")
+        return outline, content
+
+    def _generate_from_outline(self, user_prompt, language, image_executor, prefetched):
+        """Plan puis rédaction de chaque scène en parallèle ; renvoie (script, réponse brute du plan).
+
+        Les images sont cherchées scène par scène, dans l'ordre, dès que chacune est rédigée."""
+        outline, content = self._generate_outline(user_prompt, language)
+        # Les workers lisent le plan d'origine pendant que les scènes rédigées le remplacent
+        plan = copy.deepcopy(outline)
+        scenes = outline['scenes']
+        workers = max(1, min(GEMINI_SCENE_WORKERS, len(scenes)))
+        print(f"✍️ Rédaction de {len(scenes)} scènes ({workers} appels en parallèle)...")
+
+        start = time.time()
+        with tracing.span("gemini.fan_out", scenes=len(scenes), workers=workers):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._generate_scene, plan, i, language) for i in range(len(scenes))]
+                try:
+                    for i, future in enumerate(futures):
+                        scene = future.result()
+                        # Le titre du plan fait foi : la table des matières reste cohérente
+                        scene['titre'] = plan['scenes'][i]['titre']
+                        scenes[i] = scene
+                        print(f"🎬 Scène {i + 1} rédigée: {scene['titre']}")
+                        if image_executor:
+                            prefetched.append(image_executor.submit(self.image_manager.resolve_scene_image, scene))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        print(f"✅ Scènes rédigées en {time.time() - start:.1f}s")
+        return outline, content
+
+    def _parse_script(self, content):
+        """JSON du script ; si la réponse est malformée, récupère l'en-tête et les scènes lisibles
+        (les scènes illisibles valent None et seront régénérées)"""
         json_content = self._extract_json_from_response(content)
-        
-        print("🔍 DEBUG - JSON extrait:")
-        print("=" * 30)
-        print(json_content[:300] + "..." if len(json_content) > 300 else json_content)
-        print("=" * 30)
 
         try:
-            script_data = json.loads(json_content)
+            return json.loads(json_content)
         except json.JSONDecodeError as e:
-            print(f"❌  : {e}")
+            print(f"⚠️ JSON invalide ({e}), récupération scène par scène...")
+            error = e
+
+        parser = IncrementalSceneParser()
+        parser.feed(content)
+        script_data = {}
+        for field in ['titre_formation', 'description', 'duree_estimee', 'niveau']:
+            match = re.search(rf'"{field}"\s*:\s*("(?:[^"\\]|\\.)*")', content)
+            if match:
+                script_data[field] = json.loads(match.group(1))
+        match = re.search(r'"objectifs"\s*:\s*(\[[^\]]*\])', content)
+        if match:
+            try:
+                script_data['objectifs'] = json.loads(match.group(1))
+            except json.JSONDecodeError:
+                pass
+
+        if 'titre_formation' not in script_data or not parser.items:
             print(f"🔍 Contenu à parser: {json_content[:200]}...")
-            raise Exception(f"Erreur de parsing JSON: {e}")
-        
-        # Valider et corriger les URLs d'images avec le gestionnaire d'images
-        script_data = self.image_manager.validate_and_fix_image_urls(script_data)
-
-        self._validate_script_structure(script_data)
-        print("✅ Script généré avec succès!")
+            raise Exception(f"Erreur de parsing JSON: {error}")
+        script_data.setdefault('description', script_data['titre_formation'])
+        script_data['scenes'] = parser.items
+        print(f"🩹 {parser.scene_count} scènes récupérées, {parser.broken_count} illisibles")
         return script_data
 
+    def _repair_broken_scenes(self, script_data, language):
+        """Valide chaque scène et ne redemande à Gemini que celles qui sont illisibles ou incomplètes"""
+        scenes = script_data.get('scenes')
+        if not isinstance(scenes, list):
+            return
+
+        broken = {}
+        for i, scene in enumerate(scenes):
+            if scene is None:
+                broken[i] = ["JSON illisible"]
+                continue
+            if isinstance(scene, dict) and not isinstance(scene.get('numero'), int):
+                scene['numero'] = i + 1
+            errors = validate_scene(scene)
+            if errors:
+                broken[i] = errors
+        if not broken:
+            return
+
+        for i, errors in broken.items():
+            print(f"🩹 Scène {i + 1} à régénérer: {'; '.join(errors)}")
+        with tracing.span("gemini.repair", scenes=len(broken)):
+            workers = max(1, min(SCENE_REPAIR_WORKERS, len(broken)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {i: executor.submit(self._generate_scene, script_data, i, language) for i in broken}
+                for i, future in futures.items():
+                    scenes[i] = future.result()
+        print(f"✅ {len(broken)} scène(s) régénérée(s) sur {len(scenes)}")
+
+    def _generate_scene(self, script_data, index, language):
+        """Demande une seule scène à Gemini, avec son titre, son résumé éventuel (plan)
+        et le contexte des scènes voisines"""
+        scenes = script_data['scenes']
+        neighbours = {
+            label: scenes[position].get('titre')
+            for label, position in (("previous", index - 1), ("next", index + 1))
+            if 0 <= position < len(scenes) and isinstance(scenes[position], dict)
+        }
+        partial = scenes[index] if isinstance(scenes[index], dict) else {}
+
+        if language == 'en':
+            prompt = (f"You are writing scene {index + 1} of the training \"{script_data['titre_formation']}\" "
+                      f"({script_data.get('description', '')}).\n")
+            if partial.get('titre'):
+                prompt += f"Scene title: {partial['titre']}\n"
+            if partial.get('resume'):
+                prompt += f"It must cover: {partial['resume']}\n"
+            if neighbours.get('previous'):
+                prompt += f"Previous scene: {neighbours['previous']}\n"
+            if neighbours.get('next'):
+                prompt += f"Next scene: {neighbours['next']}\n"
+            prompt += ("Respond ONLY with the JSON object of this scene: numero, titre, voix_off (180-250 words), "
+                       "elements_visuels (descriptive keywords for image search, no URL), points_cles (3-4 points).")
+        else:
+            prompt = (f"Tu rédiges la scène {index + 1} de la formation \"{script_data['titre_formation']}\" "
+                      f"({script_data.get('description', '')}).\n")
+            if partial.get('titre'):
+                prompt += f"Titre de la scène : {partial['titre']}\n"
+            if partial.get('resume'):
+                prompt += f"Elle doit couvrir : {partial['resume']}\n"
+            if neighbours.get('previous'):
+                prompt += f"Scène précédente : {neighbours['previous']}\n"
+            if neighbours.get('next'):
+                prompt += f"Scène suivante : {neighbours['next']}\n"
+            prompt += ("Réponds UNIQUEMENT avec l'objet JSON de cette scène : numero, titre, voix_off (180-250 mots), "
+                       "elements_visuels (mots-clés descriptifs pour recherche d'image, pas d'URL), "
+                       "points_cles (3-4 points).")
+
+        generation_config = dict(self.generation_config)
+        if self.json_schema:
+            generation_config["response_schema"] = SCENE_SCHEMA
+
+        errors = []
+        for attempt in range(max(1, SCENE_REPAIR_ATTEMPTS)):
+            with tracing.span("gemini.generate", repair_scene=index + 1, attempt=attempt) as current:
+                try:
+                    response = self.model.generate_content(prompt, generation_config=generation_config)
+                    content = response.text.strip()
+                    current.set(chars=len(content))
+                    scene = json.loads(self._extract_json_from_response(content))
+                except Exception as e:
+                    errors = [str(e)]
+                    continue
+            if isinstance(scene, dict) and isinstance(scene.get('scenes'), list) and scene['scenes']:
+                # Certains modèles renvoient un script entier : on garde sa première scène
+                scene = scene['scenes'][0]
+            if isinstance(scene, dict):
+                scene['numero'] = index + 1
+            errors = validate_scene(scene)
+            if not errors:
+                return scene
+        raise ValueError(f"Scène {index + 1} non générée après {SCENE_REPAIR_ATTEMPTS} essai(s): {'; '.join(errors)}")
+
     def _extract_json_from_response(self, content):
         """Extrait le JSON de la réponse de l'API, même s'il y a du texte avant/après"""
         import re
@@ -205,7 +540,7 @@ Réponds UNIQUEMENT avec un JSON valide dans ce format exact:
         return content
     
 
-    def _validate_script_structure(self, script_data):
+    def _validate_script_structure(self, script_data, check_urls=True):
         required_fields = ['titre_formation', 'description', 'scenes']
         for field in required_fields:
             if field not in script_data:
@@ -222,77 +557,26 @@ Réponds UNIQUEMENT avec un JSON valide dans ce format exact:
                 if field not in scene:
                     raise ValueError(f"Scène {i+1} - champ manquant: {field}")
               # Valider que elements_visuels est une URL valide
-            if not scene['elements_visuels'].startswith(('http://', 'https://')):
+            if check_urls and not scene['elements_visuels'].startswith(('http://', 'https://')):
                 print(f"⚠️ Scène {i+1}: L'élément visuel ne semble pas être une URL valide")    
 
     def save_script_to_file(self, script_data, filename=None, folder="data"):
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"script_formation_{timestamp}.json"
+            filename = f"{exporters.make_stem()}.json"
 
         full_path = os.path.join(folder, filename)
-
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(script_data, f, ensure_ascii=False, indent=2)
+        exporters.write_atomic(exporters.render_json, script_data, full_path)
 
         print(f"💾 Script JSON sauvegardé dans: {full_path}")
         return full_path
 
-    def json_to_pdf(self, script_data, folder="script"):
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pdf_path = os.path.join(folder, f"script_formation_{timestamp}.pdf")
-
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 16)
-
-        pdf.cell(0, 10, script_data.get('titre_formation', 'Formation'), ln=True)
-
-        pdf.set_font("Arial", '', 12)
-        pdf.multi_cell(0, 10, script_data.get('description', ''))
-
-        pdf.ln(5)
-        pdf.set_font("Arial", 'I', 12)
-        pdf.cell(0, 10, f"Durée estimée: {script_data.get('duree_estimee', 'N/A')}")
-        pdf.ln()
-        pdf.cell(0, 10, f"Niveau: {script_data.get('niveau', 'N/A')}")
-        pdf.ln(10)
-
-        # Objectifs
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, "Objectifs :", ln=True)
-        pdf.set_font("Arial", '', 12)
-        for obj in script_data.get('objectifs', []):
-            pdf.cell(0, 8, f"- {obj}", ln=True)
-        pdf.ln(10)
-
-        # Scènes
-        for scene in script_data.get('scenes', []):
-            pdf.set_font("Arial", 'B', 13)
-            pdf.cell(0, 10, f"Scène {scene['numero']}: {scene['titre']}", ln=True)
-
-            pdf.set_font("Arial", '', 12)
-            pdf.multi_cell(0, 10, f"Voix off:\n{scene['voix_off']}")
-            pdf.ln(3)
-            pdf.multi_cell(0, 10, f"Éléments visuels:\n{scene['elements_visuels']}")
-            pdf.ln(3)
-
-            if scene.get('points_cles'):
-                pdf.set_font("Arial", 'I', 12)
-                pdf.cell(0, 8, "Points clés:", ln=True)
-                pdf.set_font("Arial", '', 12)
-                for point in scene['points_cles']:
-                    pdf.cell(0, 8, f"- {point}", ln=True)
-            pdf.ln(10)
-
-        pdf.output(pdf_path)
+    def json_to_pdf(self, script_data, folder="script", filename=None):
+        if filename is None:
+            filename = f"{exporters.make_stem()}.pdf"
+
+        pdf_path = os.path.join(folder, filename)
+        exporters.write_atomic(exporters.render_pdf, script_data, pdf_path)
+
         print(f"📄 PDF sauvegardé dans: {pdf_path}")
         return pdf_path
 
@@ -322,54 +606,12 @@ Réponds UNIQUEMENT avec un JSON valide dans ce format exact:
                 print(f"   🔑 Points clés: {', '.join(scene['points_cles'])}")
                
 
-    def json_to_ppt(self, script_data, folder="script"):
-        if not os.path.exists(folder):
-            os.makedirs(folder)
+    def json_to_ppt(self, script_data, folder="script", filename=None):
+        if filename is None:
+            filename = f"{exporters.make_stem()}.pptx"
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        ppt_path = os.path.join(folder, f"script_formation_{timestamp}.pptx")
+        ppt_path = os.path.join(folder, filename)
+        exporters.write_atomic(exporters.render_ppt, script_data, ppt_path)
 
-        prs = Presentation()
-        
-        # Slide de titre
-        title_slide = prs.slides.add_slide(prs.slide_layouts[0])
-        title = title_slide.shapes.title
-        subtitle = title_slide.placeholders[1]
-        
-        title.text = script_data.get('titre_formation', 'Formation')
-        subtitle.text = f"{script_data.get('description', '')}\n\nDurée: {script_data.get('duree_estimee', 'N/A')} | Niveau: {script_data.get('niveau', 'N/A')}"
-
-        # Slide des objectifs
-        if script_data.get('objectifs'):
-            obj_slide = prs.slides.add_slide(prs.slide_layouts[1])
-            obj_slide.shapes.title.text = "Objectifs de la formation"
-            content = obj_slide.placeholders[1]
-            
-            obj_text = ""
-            for obj in script_data['objectifs']:
-                obj_text += f"• {obj}\n"
-            content.text = obj_text
-
-        # Slides pour chaque scène
-        for scene in script_data.get('scenes', []):
-            slide = prs.slides.add_slide(prs.slide_layouts[1])
-            
-            # Titre de la scène
-            slide.shapes.title.text = f"Scène {scene['numero']}: {scene['titre']}"
-            
-            # Contenu
-            content = slide.placeholders[1]
-            scene_text = f"Voix off:\n{scene['voix_off']}\n\n"
-            scene_text += f"Éléments visuels:\n{scene['elements_visuels']}\n\n"
-            
-            if scene.get('points_cles'):
-                scene_text += "Points clés:\n"
-                for point in scene['points_cles']:
-                    scene_text += f"• {point}\n"
-                    
-            content.text = scene_text
-
-        prs.save(ppt_path)
         print(f"📊 PowerPoint sauvegardé dans: {ppt_path}")
         return ppt_path
-    
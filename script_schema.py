@@ -0,0 +1,111 @@
+# Schéma du script de formation, au format accepté par Gemini (sous-ensemble OpenAPI).
+# Le même schéma contraint la sortie du modèle et sert à valider chaque scène reçue.
+SCENE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "numero": {"type": "integer"},
+        "titre": {"type": "string"},
+        "voix_off": {"type": "string"},
+        "elements_visuels": {"type": "string"},
+        "points_cles": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["numero", "titre", "voix_off", "elements_visuels", "points_cles"],
+}
+
+SCRIPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "titre_formation": {"type": "string"},
+        "description": {"type": "string"},
+        "duree_estimee": {"type": "string"},
+        "niveau": {"type": "string"},
+        "objectifs": {"type": "array", "items": {"type": "string"}},
+        "scenes": {"type": "array", "items": SCENE_SCHEMA},
+    },
+    "required": ["titre_formation", "description", "objectifs", "scenes"],
+}
+
+# Plan du script (mode en deux temps) : les scènes ne portent qu'un titre et un résumé
+OUTLINE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "titre_formation": {"type": "string"},
+        "description": {"type": "string"},
+        "duree_estimee": {"type": "string"},
+        "niveau": {"type": "string"},
+        "objectifs": {"type": "array", "items": {"type": "string"}},
+        "scenes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "numero": {"type": "integer"},
+                    "titre": {"type": "string"},
+                    "resume": {"type": "string"},
+                },
+                "required": ["numero", "titre", "resume"],
+            },
+        },
+    },
+    "required": ["titre_formation", "description", "objectifs", "scenes"],
+}
+
+TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+}
+
+
+def compile_validator(schema):
+    """Transforme le schéma en une fonction validate(value, path) -> liste d'erreurs.
+
+    Le schéma n'est parcouru qu'une fois ; chaque validation n'exécute plus que les contrôles utiles.
+    Les chaînes obligatoires doivent en plus être non vides."""
+    checks = []
+    type_check = TYPE_CHECKS.get(schema.get("type"))
+    type_name = schema.get("type")
+
+    properties = {name: compile_validator(sub_schema) for name, sub_schema in schema.get("properties", {}).items()}
+    required = schema.get("required", [])
+    required_strings = {name for name in required if schema["properties"].get(name, {}).get("type") == "string"}
+
+    if properties or required:
+        def check_properties(value, path):
+            errors = []
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}{name}: champ manquant")
+                elif name in required_strings and isinstance(value[name], str) and not value[name].strip():
+                    errors.append(f"{path}{name}: vide")
+            for name, validate in properties.items():
+                if name in value:
+                    errors.extend(validate(value[name], f"{path}{name}."))
+            return errors
+        checks.append(check_properties)
+
+    if "items" in schema:
+        validate_item = compile_validator(schema["items"])
+
+        def check_items(value, path):
+            errors = []
+            for i, item in enumerate(value):
+                errors.extend(validate_item(item, f"{path}{i}."))
+            return errors
+        checks.append(check_items)
+
+    def validate(value, path=""):
+        if type_check and not type_check(value):
+            return [f"{path.rstrip('.') or 'valeur'}: type {type(value).__name__} au lieu de {type_name}"]
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+        return errors
+    return validate
+
+
+validate_scene = compile_validator(SCENE_SCHEMA)
+validate_outline = compile_validator(OUTLINE_SCHEMA)
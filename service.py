@@ -0,0 +1,327 @@
+import os
+import re
+import hmac
+import json
+import queue
+import argparse
+import mimetypes
+import threading
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import tracing
+import language_detection
+from cache_store import CacheStore
+from image_manager import ImageManager
+from script_generator import ScriptGenerator, GENERATION_MODES, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES
+from job_store import JobStore, CoursePipeline
+from exporters import available_formats
+
+load_dotenv()
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "4"))
+# Clé optionnelle exigée dans l'en-tête Authorization: Bearer <clé>
+SERVICE_API_KEY = os.getenv("SERVICE_API_KEY")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class CourseService:
+    """Service HTTP : les demandes de formation sont mises en file et traitées par un pool de workers.
+
+    Chaque worker garde son CoursePipeline (et donc son client Gemini) pour toute la durée du service ;
+    le gestionnaire d'images, le cache LLM et le suivi des formations sont partagés."""
+
+    def __init__(self, workers=None, host=None, port=None, store=None, video_backend=None,
+                 generation_mode=None, api_key=None):
+        self.workers = max(1, workers or SERVICE_WORKERS)
+        self.video_backend = video_backend
+        self.generation_mode = generation_mode
+        self.api_key = SERVICE_API_KEY if api_key is None else api_key
+        self.store = store or JobStore()
+        # Un seul gestionnaire d'images : ses limiteurs de débit valent pour tous les workers
+        self.image_manager = ImageManager()
+        self.llm_cache = None
+        self.queue = queue.Queue()
+        self.threads = []
+        self.active = 0
+        self.active_lock = threading.Lock()
+
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if not service.authorized(self.headers.get("Authorization")):
+                    return self._send(401, {"error": "clé API invalide"})
+                try:
+                    result = service.handle(method, self.path, body, self.headers)
+                except ValueError as e:
+                    result = 400, {"error": str(e)}
+                except Exception as e:
+                    print(f"💥 [service] {method} {self.path}: {e}")
+                    result = 500, {"error": str(e)}
+                if len(result) == 3:
+                    self._send_file(*result)
+                else:
+                    self._send(*result)
+
+            def _send(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_file(self, status, path, byte_range):
+                """Envoie le fichier par morceaux (ou la plage demandée) sans le charger en mémoire"""
+                size = os.path.getsize(path)
+                start, end = byte_range or (0, size - 1)
+                self.send_response(status)
+                self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                if byte_range:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        chunk = f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host or SERVICE_HOST, SERVICE_PORT if port is None else port), Handler)
+        self.httpd.daemon_threads = True
+        self.http_thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def authorized(self, header):
+        if not self.api_key:
+            return True
+        return hmac.compare_digest(header or "", f"Bearer {self.api_key}")
+
+    def make_pipeline(self):
+        """Pipeline d'un worker, créé à sa première formation puis réutilisé"""
+        generator = ScriptGenerator(image_manager=self.image_manager, llm_cache=self.llm_cache,
+                                    mode=self.generation_mode)
+        return CoursePipeline(self.store, generator=generator, image_manager=self.image_manager,
+                              video_backend=self.video_backend)
+
+    def submit(self, prompt, formats=None, video=None, force_regenerate=False):
+        """Enregistre une demande et la met en file ; renvoie la formation créée"""
+        prompt = (prompt or "").strip()
+        if not prompt:
+            raise ValueError("prompt manquant")
+        if isinstance(formats, str):
+            formats = [fmt.strip() for fmt in formats.split(",") if fmt.strip()]
+        if formats == ["all"]:
+            formats = available_formats()
+        unknown = [fmt for fmt in formats or [] if fmt not in available_formats()]
+        if unknown:
+            raise ValueError(f"format(s) inconnu(s): {', '.join(unknown)} (choix: {', '.join(available_formats())})")
+
+        options = {"formats": formats or ["json"], "video": bool(video), "force_regenerate": bool(force_regenerate),
+                   "service": True}
+        job = self.store.create(prompt, options, status="queued")
+        self.queue.put(job["id"])
+        print(f"📥 [{job['id']}] Demande en file ({self.queue.qsize()} en attente): {prompt[:60]}")
+        return job
+
+    def _worker(self):
+        pipeline = None
+        while True:
+            job_id = self.queue.get()
+            if job_id is None:
+                break
+            with self.active_lock:
+                self.active += 1
+            try:
+                if pipeline is None:
+                    pipeline = self.make_pipeline()
+                # Prise en charge atomique : `job_store.py resume` a pu la reprendre entre-temps
+                job = self.store.start(job_id, expected="queued")
+                if job is None:
+                    print(f"⏭️ [{job_id}] Déjà prise en charge ailleurs")
+                    continue
+                pipeline.run(job, force_regenerate=job["options"].get("force_regenerate", False))
+            except Exception as e:
+                print(f"❌ [{job_id}] {e}")
+                self.store.fail(job_id, e)
+            finally:
+                with self.active_lock:
+                    self.active -= 1
+
+    def job_view(self, job):
+        """Représentation publique d'une formation : étapes, erreur et artefacts téléchargeables"""
+        folder = self.store.job_dir(job["id"])
+        artifacts = []
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if os.path.isfile(path) and not name.endswith((".tmp", ".part")):
+                    artifacts.append({"name": name, "size": os.path.getsize(path),
+                                      "url": f"/jobs/{job['id']}/artifacts/{name}"})
+        return {
+            "id": job["id"],
+            "prompt": job["prompt"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "stages": job["stages"],
+            "options": {key: value for key, value in job["options"].items() if key != "service"},
+            "video_ids": job["data"].get("video_ids"),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "artifacts": artifacts,
+        }
+
+    def handle(self, method, path, body, headers):
+        """Route une requête ; renvoie (statut, JSON) ou (statut, fichier, plage) pour un artefact"""
+        parsed = urlparse(path)
+        route = parsed.path.rstrip("/") or "/"
+
+        if method == "GET" and route == "/health":
+            return 200, {"status": "ok", "workers": self.workers, "active": self.active,
+                         "queued": self.queue.qsize()}
+
+        if route == "/jobs":
+            if method == "POST":
+                try:
+                    request = json.loads(body or b"{}")
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"JSON invalide: {e}")
+                if not isinstance(request, dict):
+                    raise ValueError("objet JSON attendu")
+                job = self.submit(request.get("prompt"), request.get("formats"), request.get("video"),
+                                  request.get("force_regenerate", False))
+                return 202, self.job_view(job)
+            query = parse_qs(parsed.query)
+            jobs = self.store.list(query.get("status", [None])[0], int(query.get("limit", ["50"])[0]))
+            return 200, {"jobs": [self.job_view(self.store.get(job["id"])) for job in jobs]}
+
+        match = re.fullmatch(r"/jobs/([\w-]+)", route)
+        if method == "GET" and match:
+            job = self.store.get(match.group(1))
+            return (200, self.job_view(job)) if job else (404, {"error": "formation inconnue"})
+
+        match = re.fullmatch(r"/jobs/([\w-]+)/artifacts/([^/]+)", route)
+        if method == "GET" and match:
+            job_id, name = match.groups()
+            folder = self.store.job_dir(job_id)
+            # Seuls les fichiers listés par job_view sont servis (pas de chemin relatif, ni dossier, ni fichier partiel)
+            if not os.path.isdir(folder) or name not in os.listdir(folder):
+                return 404, {"error": "artefact inconnu"}
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path) or name.endswith((".tmp", ".part")):
+                return 404, {"error": "artefact inconnu"}
+            size = os.path.getsize(path)
+            range_match = re.fullmatch(r"bytes=(\d+)-(\d*)", headers.get("Range") or "")
+            if range_match:
+                start = int(range_match.group(1))
+                end = min(int(range_match.group(2)) if range_match.group(2) else size - 1, size - 1)
+                if start > end:
+                    return 416, {"error": "plage invalide"}
+                return 206, path, (start, end)
+            return 200, path, None
+
+        return 404, {"error": "route inconnue"}
+
+    def start(self, resume=True):
+        # Le cache LLM est ouvert une fois pour tous les workers
+        if os.getenv("LLM_CACHE", "1") != "0":
+            self.llm_cache = CacheStore(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+        language_detection.warm_up_in_background()
+
+        if resume:
+            # Demandes du service restées en file ou en cours lors du dernier arrêt
+            for job in self.store.unfinished():
+                if job["options"].get("service") and job["status"] in ("queued", "running"):
+                    print(f"🔁 [{job['id']}] Reprise après l'étape {job['stage'] or 'aucune'}")
+                    self.store.requeue(job["id"])
+                    self.queue.put(job["id"])
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"service-worker-{i + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.http_thread = threading.Thread(target=self.httpd.serve_forever, name="service-http", daemon=True)
+        self.http_thread.start()
+        print(f"🚀 Service prêt sur {self.url} ({self.workers} workers)")
+        return self
+
+    def stop(self, wait=True):
+        """Arrête l'API puis les workers après les formations en cours"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for _ in self.threads:
+            self.queue.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+        self.threads = []
+        if tracing.is_enabled():
+            tracing.print_summary()
+            tracing.save(os.path.join(self.store.root, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de génération de formations")
+    parser.add_argument("--host", default=None, help=f"Adresse d'écoute (défaut: {SERVICE_HOST})")
+    parser.add_argument("--port", type=int, default=None, help=f"Port (défaut: {SERVICE_PORT})")
+    parser.add_argument("--workers", type=int, default=None, help=f"Formations traitées en parallèle "
+                                                                  f"(défaut: {SERVICE_WORKERS})")
+    parser.add_argument("--root", default=None, help="Dossier des formations (défaut: JOB_STORE_DIR ou data/jobs)")
+    parser.add_argument("--video-backend", choices=["synthesia", "local"],
+                        help="Moteur de rendu vidéo (défaut: VIDEO_BACKEND ou synthesia)")
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES,
+                        help="Mode de génération Gemini (défaut: GEMINI_GENERATION_MODE ou single)")
+    parser.add_argument("--no-resume", action="store_true", help="Ne pas reprendre les demandes interrompues")
+    parser.add_argument("--trace", action="store_true", help="Enregistrer une trace Chrome à l'arrêt du service")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+
+    service = CourseService(workers=args.workers, host=args.host, port=args.port, store=JobStore(args.root),
+                            video_backend=args.video_backend, generation_mode=args.generation_mode)
+    service.start(resume=not args.no_resume)
+    try:
+        service.http_thread.join()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt du service (les formations en cours se terminent)...")
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from create_video_from_script import (
+    build_video_payload,
+    submit_video,
+    get_video_status,
+    download_video_file,
+    RENDER_TIMEOUT,
+)
+from ffmpeg_utils import concat_files
+from webhook_receiver import get_receiver, WEBHOOK_DEADLINE, FALLBACK_POLL_INTERVAL
+
+MAX_IN_FLIGHT = int(os.getenv("SYNTHESIA_MAX_IN_FLIGHT", "3"))
+MIN_POLL_INTERVAL = float(os.getenv("SYNTHESIA_MIN_POLL_INTERVAL", "5"))
+MAX_POLL_INTERVAL = float(os.getenv("SYNTHESIA_MAX_POLL_INTERVAL", "60"))
+# Scènes par rendu pour les longues formations (0 = une seule vidéo) et nouvelles tentatives par partie
+CHUNK_SCENES = int(os.getenv("SYNTHESIA_CHUNK_SCENES", "6"))
+CHUNK_RETRIES = int(os.getenv("SYNTHESIA_CHUNK_RETRIES", "2"))
+
+
+class RenderJob:
+    """Suivi d'un rendu Synthesia : payload, ID vidéo, statut et fichier téléchargé"""
+
+    def __init__(self, name, payload):
+        self.name = name
+        self.payload = payload
+        self.video_id = None
+        self.status = "pending"
+        self.submitted_at = None
+        self.next_poll = 0.0
+        self.polls = 0
+        self.download_url = None
+        self.video_path = None
+        self.error = None
+        # Rendu perdu côté Synthesia (échec du rendu, vidéo inconnue) : seule une nouvelle soumission aide
+        self.lost = False
+
+    def reset(self):
+        """Remet le job en attente pour une nouvelle soumission"""
+        self.video_id = None
+        self.status = "pending"
+        self.submitted_at = None
+        self.next_poll = 0.0
+        self.polls = 0
+        self.download_url = None
+        self.video_path = None
+        self.error = None
+        self.lost = False
+
+    def attach(self, video_id):
+        """Reprend le suivi d'un rendu déjà soumis (après une interruption)"""
+        self.reset()
+        self.video_id = video_id
+        self.status = "queued"
+        self.submitted_at = time.monotonic()
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "video_id": self.video_id,
+            "status": self.status,
+            "polls": self.polls,
+            "video_path": self.video_path,
+            "error": self.error,
+        }
+
+
+class SynthesiaOrchestrator:
+    """Soumet plusieurs rendus, les suit ensemble et télécharge chaque vidéo dès qu'elle est prête"""
+
+    def __init__(self, max_in_flight=None, api_url=None, api_key=None, output_dir=None,
+                 min_interval=None, max_interval=None, timeout=None, download_workers=2, webhooks=None,
+                 on_submit=None):
+        self.max_in_flight = max(1, max_in_flight or MAX_IN_FLIGHT)
+        self.api_url = api_url
+        self.api_key = api_key
+        self.output_dir = output_dir
+        self.min_interval = MIN_POLL_INTERVAL if min_interval is None else min_interval
+        self.max_interval = MAX_POLL_INTERVAL if max_interval is None else max_interval
+        self.timeout = RENDER_TIMEOUT if timeout is None else timeout
+        self.download_workers = download_workers
+        # Récepteur de notifications (webhooks=False pour rester au polling seul)
+        self.webhooks = get_receiver() if webhooks is None else webhooks or None
+        # Appelé avec le job dès que Synthesia a accepté le rendu (enregistrement de l'ID vidéo)
+        self.on_submit = on_submit
+        self.jobs = []
+
+    def add_payload(self, payload, name=None):
+        job = RenderJob(name or payload.get("title", f"job_{len(self.jobs) + 1}"), payload)
+        self.jobs.append(job)
+        return job
+
+    def add_script(self, json_file_path):
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            script_data = json.load(f)
+        payload = build_video_payload(script_data)
+        if payload is None:
+            return None
+        return self.add_payload(payload, name=os.path.basename(json_file_path))
+
+    def _next_interval(self, status, elapsed):
+        """Attente avant le prochain poll : courte au début, plus longue quand le rendu s'éternise"""
+        if status == "queued":
+            base = max(self.min_interval * 2, elapsed * 0.25)
+        else:
+            base = max(self.min_interval, elapsed * 0.1)
+        interval = min(self.max_interval, base)
+        if self.webhooks:
+            # Les notifications font l'essentiel : le polling n'est qu'un filet de sécurité
+            interval = max(interval, FALLBACK_POLL_INTERVAL)
+        return interval * random.uniform(0.9, 1.1)
+
+    def _submit(self, job):
+        try:
+            job.video_id = submit_video(job.payload, api_url=self.api_url, api_key=self.api_key)
+        except Exception as e:
+            job.video_id = None
+            job.error = str(e)
+
+        if not job.video_id:
+            job.status = "failed"
+            job.error = job.error or "soumission refusée"
+            print(f"❌ [{job.name}] Soumission échouée: {job.error}")
+            return
+
+        job.status = "queued"
+        job.submitted_at = time.monotonic()
+        # Avec webhook, aucun poll avant le délai de notification
+        job.next_poll = job.submitted_at + (WEBHOOK_DEADLINE if self.webhooks else self.min_interval)
+        print(f"✅ [{job.name}] Vidéo soumise, ID: {job.video_id}")
+        if self.on_submit:
+            self.on_submit(job)
+
+    def _poll(self, job, downloads):
+        now = time.monotonic()
+        elapsed = now - job.submitted_at
+        job.polls += 1
+        try:
+            info = get_video_status(job.video_id, api_url=self.api_url, api_key=self.api_key)
+        except Exception as e:
+            status_code = getattr(e, "status_code", None)
+            if status_code and 400 <= status_code < 500 and status_code not in (408, 429):
+                # Clé refusée, vidéo inconnue... : réessayer ne changera rien
+                job.status = "failed"
+                job.lost = True
+                job.error = str(e)
+                print(f"❌ [{job.name}] {e}")
+            elif elapsed > self.timeout:
+                job.status = "timeout"
+                job.error = f"statut inaccessible depuis {self.timeout:.0f}s: {e}"
+                print(f"⏰ [{job.name}] {job.error}")
+            else:
+                # Erreur transitoire : on réessaie plus tard plutôt que d'abandonner le rendu
+                print(f"⚠️ [{job.name}] {e}")
+                job.next_poll = now + self._next_interval(job.status, elapsed)
+            return
+        self._apply_status(job, info, downloads)
+
+    def _apply_status(self, job, info, downloads):
+        """Applique un statut reçu par poll ou par notification"""
+        now = time.monotonic()
+        elapsed = now - job.submitted_at
+        status = info.get("status")
+        if status == "complete":
+            job.download_url = info.get("download")
+            if not job.download_url:
+                job.status = "failed"
+                job.error = "vidéo complète mais pas de lien de téléchargement"
+                print(f"⚠️ [{job.name}] {job.error}")
+                return
+            job.status = "downloading"
+            print(f"🎬 [{job.name}] Rendu terminé après {elapsed:.0f}s, téléchargement...")
+            downloads.append(self._executor.submit(self._download, job))
+        elif status == "failed":
+            job.status = "failed"
+            job.lost = True
+            job.error = "la génération de la vidéo a échoué"
+            print(f"❌ [{job.name}] La génération de la vidéo a échoué")
+        elif elapsed > self.timeout:
+            job.status = "timeout"
+            job.error = f"rendu non terminé après {self.timeout:.0f}s"
+            print(f"⏰ [{job.name}] Timeout, consultez : https://app.synthesia.io/video/{job.video_id}")
+        else:
+            job.status = status or job.status
+            job.next_poll = now + self._next_interval(job.status, elapsed)
+
+    def _download(self, job):
+        job.video_path = download_video_file(job.download_url, job.video_id, folder=self.output_dir)
+        if job.video_path:
+            job.status = "done"
+        else:
+            job.status = "failed"
+            job.error = "téléchargement échoué"
+        return job
+
+    def run(self):
+        """Traite tous les rendus et renvoie la liste des jobs une fois terminés"""
+        pending = [job for job in self.jobs if job.status == "pending"]
+        # Rendus repris : le statut est vérifié tout de suite, la notification a pu être manquée
+        rendering = [job for job in self.jobs if job.status == "queued"]
+        downloads = []
+        print(f"🚀 {len(pending)} rendus à traiter ({self.max_in_flight} en parallèle maximum)")
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as self._executor:
+            while pending or rendering:
+                while pending and len(rendering) < self.max_in_flight:
+                    job = pending.pop(0)
+                    self._submit(job)
+                    if job.status == "queued":
+                        rendering.append(job)
+
+                if self.webhooks:
+                    for job in rendering:
+                        info = self.webhooks.pop(job.video_id)
+                        if info and info.get("status") == "complete" and not info.get("download"):
+                            # Notification sans lien : on interroge l'API tout de suite
+                            job.next_poll = 0
+                        elif info:
+                            self._apply_status(job, info, downloads)
+
+                now = time.monotonic()
+                for job in [job for job in rendering if job.status in ("queued", "in_progress") and job.next_poll <= now]:
+                    self._poll(job, downloads)
+                rendering = [job for job in rendering if job.status in ("queued", "in_progress")]
+
+                if rendering:
+                    wait = min(job.next_poll for job in rendering) - time.monotonic()
+                    if wait > 0:
+                        if self.webhooks:
+                            # Réveil immédiat dès qu'une des vidéos en cours est notifiée
+                            self.webhooks.wait_any([job.video_id for job in rendering], wait)
+                        else:
+                            time.sleep(wait)
+
+            for future in downloads:
+                future.result()
+
+        done = sum(1 for job in self.jobs if job.status == "done")
+        print(f"📊 {done}/{len(self.jobs)} vidéos téléchargées")
+        return self.jobs
+
+
+def split_payload(payload, chunk_scenes=None):
+    """Découpe un payload en rendus de chunk_scenes scènes ; l'intro reste en tête de la première partie"""
+    chunk_scenes = CHUNK_SCENES if chunk_scenes is None else chunk_scenes
+    intro, scenes = payload["input"][:1], payload["input"][1:]
+    if chunk_scenes <= 0 or len(scenes) <= chunk_scenes:
+        return [payload]
+
+    groups = [scenes[i:i + chunk_scenes] for i in range(0, len(scenes), chunk_scenes)]
+    return [
+        {**payload, "title": f"{payload.get('title', '')} ({i + 1}/{len(groups)})",
+         "input": (intro if i == 0 else []) + group}
+        for i, group in enumerate(groups)
+    ]
+
+
+@tracing.traced("synthesia.render_chunks")
+def render_in_chunks(payloads, folder=None, max_in_flight=None, retries=None, api_url=None, api_key=None,
+                     video_ids=None, on_submit=None):
+    """Rend chaque partie en parallèle, ne resoumet que les parties dont le rendu a échoué, puis les assemble
+    sans réencodage ; renvoie le chemin de la vidéo complète.
+
+    Une partie en timeout ou dont le téléchargement a échoué n'est pas resoumise (le rendu, déjà payé,
+    peut encore aboutir) : son suivi reprend sur le même ID vidéo.
+
+    video_ids reprend les parties déjà soumises ; on_submit reçoit la liste des IDs à chaque soumission."""
+    retries = CHUNK_RETRIES if retries is None else retries
+    folder = folder or os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="parties_", dir=folder)
+    jobs = []
+
+    def submitted(job):
+        if on_submit:
+            on_submit([job.video_id for job in jobs])
+
+    orchestrator = SynthesiaOrchestrator(max_in_flight=max_in_flight, api_url=api_url, api_key=api_key,
+                                         output_dir=work_dir, on_submit=submitted)
+    jobs.extend(orchestrator.add_payload(payload, name=f"partie {i + 1}/{len(payloads)}")
+                for i, payload in enumerate(payloads))
+    for job, video_id in zip(jobs, video_ids or []):
+        if video_id:
+            job.attach(video_id)
+    tracing.annotate(chunks=len(jobs))
+
+    try:
+        for attempt in range(retries + 1):
+            orchestrator.run()
+            failed = [job for job in jobs if job.status != "done"]
+            if not failed:
+                break
+            names = ", ".join(f"{job.name} ({job.error})" for job in failed)
+            if attempt >= retries:
+                raise Exception(f"{len(failed)} partie(s) en échec après {retries + 1} essai(s): {names}")
+            print(f"🔁 Nouvel essai pour {len(failed)} partie(s): {names}")
+            tracing.annotate(retries=attempt + 1)
+            for job in failed:
+                if job.video_id and not job.lost:
+                    print(f"   [{job.name}] suivi repris sur {job.video_id}")
+                    job.attach(job.video_id)
+                else:
+                    print(f"   [{job.name}] nouvelle soumission")
+                    job.reset()
+
+        # Même avatar et mêmes réglages de rendu : les parties se concatènent sans réencodage
+        output_path = os.path.join(folder, f"video_{jobs[0].video_id}.mp4")
+        concat_files([job.video_path for job in jobs], output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"✅ {len(jobs)} parties assemblées: {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendu Synthesia de plusieurs scripts en parallèle")
+    parser.add_argument("scripts", nargs="+", help="Fichiers JSON de scripts de formation")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Rendus simultanés maximum")
+    parser.add_argument("--api-url", default=None, help="URL de l'API (ex: faux serveur local)")
+    parser.add_argument("--output-dir", default=None, help="Dossier des vidéos téléchargées")
+    args = parser.parse_args()
+
+    orchestrator = SynthesiaOrchestrator(max_in_flight=args.max_in_flight, api_url=args.api_url,
+                                         output_dir=args.output_dir)
+    for path in args.scripts:
+        orchestrator.add_script(path)
+
+    jobs = orchestrator.run()
+    print(json.dumps([job.to_dict() for job in jobs], ensure_ascii=False, indent=2))
+    sys.exit(0 if all(job.status == "done" for job in jobs) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+import functools
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+_enabled = os.getenv("TRACE", "0") == "1"
+_origin = time.perf_counter()
+_events = []
+_thread_names = {}
+_events_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Span:
+    """Intervalle mesuré avec ses attributs ; ne coûte presque rien quand le tracing est désactivé"""
+
+    __slots__ = ("name", "attrs", "start", "active")
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = None
+        self.active = False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        if _enabled:
+            self.active = True
+            _stack().append(self)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.active:
+            return False
+        end = time.perf_counter()
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        thread = threading.current_thread()
+        event = {
+            "name": self.name,
+            "cat": self.name.split(".")[0],
+            "ph": "X",
+            "ts": round((self.start - _origin) * 1e6, 1),
+            "dur": round((end - self.start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": self.attrs,
+        }
+        with _events_lock:
+            _events.append(event)
+            _thread_names[thread.ident] = thread.name
+        return False
+
+
+def span(name, **attrs):
+    return Span(name, attrs)
+
+
+def annotate(**attrs):
+    """Ajoute des attributs au span en cours dans ce thread"""
+    if _enabled:
+        stack = _stack()
+        if stack:
+            stack[-1].attrs.update(attrs)
+
+
+def traced(name=None):
+    """Décorateur : chaque appel de la fonction devient un span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """{nom: {"count", "total_ms", "max_ms"}} trié par temps total décroissant"""
+    with _events_lock:
+        events = list(_events)
+    totals = {}
+    for event in events:
+        entry = totals.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += event["dur"] / 1000
+        entry["max_ms"] = max(entry["max_ms"], event["dur"] / 1000)
+    return dict(sorted(totals.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def print_summary(limit=15):
+    totals = summary()
+    if not totals:
+        return
+    print("🧭 Étapes les plus longues:")
+    for name, entry in list(totals.items())[:limit]:
+        print(f"   {name}: {entry['total_ms'] / 1000:.2f}s au total, {entry['count']} appel(s), "
+              f"max {entry['max_ms'] / 1000:.2f}s")
+
+
+def save(path=None, reset=True):
+    """Écrit la trace au format Chrome (chrome://tracing, Perfetto) et renvoie son chemin"""
+    with _events_lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+        if reset:
+            _events.clear()
+    if not events:
+        return None
+
+    if path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(TRACE_DIR, f"trace_{timestamp}.json")
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread_name}}
+        for tid, thread_name in thread_names.items()
+    ]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    print(f"🧭 Trace enregistrée: {path}")
+    return path
@@ -1,15 +1,26 @@
 import os
+import csv
 import json
+import shutil
+import tempfile
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+from ffmpeg_utils import ffmpeg_exe, ffmpeg_available, run_ffmpeg, concat_files, probe_duration
 
-def check_ffmpeg():
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+# "soft" : piste de sous-titres ajoutée sans réencodage ; "burn" : incrustés dans l'image
+SUBTITLE_MODE = os.getenv("SUBTITLE_MODE", "soft")
+
+# Incrustation : nombre de ffmpeg en parallèle (1 = un seul processus sur tout le fichier)
+BURN_WORKERS = int(os.getenv("SUBTITLE_BURN_WORKERS", "0")) or os.cpu_count() or 1
+BURN_MIN_SEGMENT_SECONDS = float(os.getenv("SUBTITLE_BURN_MIN_SEGMENT_SECONDS", "30"))
+BURN_STYLE = "Fontsize=12,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2"
 
-FFMPEG_AVAILABLE = check_ffmpeg()
+# Codes ISO 639-2 attendus par les conteneurs pour l'étiquette de langue des pistes
+LANGUAGE_CODES = {'fr': 'fra', 'en': 'eng', 'es': 'spa', 'de': 'deu', 'it': 'ita', 'pt': 'por', 'ar': 'ara'}
+
+# Codec de sous-titres accepté par chaque conteneur
+SUBTITLE_CODECS = {'.mp4': 'mov_text', '.m4v': 'mov_text', '.mov': 'mov_text', '.mkv': 'srt', '.webm': 'webvtt'}
 
 def format_time_srt(seconds):
     hours = int(seconds // 3600)
@@ -18,59 +29,184 @@ def format_time_srt(seconds):
     millisecs = int((seconds % 1) * 1000)
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
 
-def create_srt_file(script_data, output_path="subtitles.srt"):
+def build_cues(script_data):
+    """Liste des sous-titres (début, fin, texte) en secondes, une scène avec voix off par entrée"""
     scenes = script_data.get('scenes', [])
     scenes_avec_voix = [s for s in scenes if s.get('voix_off', '').strip()]
-    if not scenes_avec_voix:
-        return None
 
     duration_per_scene = 10
+    return [
+        (i * duration_per_scene, (i + 1) * duration_per_scene, scene['voix_off'].strip())
+        for i, scene in enumerate(scenes_avec_voix)
+    ]
+
+def write_srt(cues, output_path):
     srt_content = []
-    for i, scene in enumerate(scenes_avec_voix):
-        voix_off = scene.get('voix_off', '').strip()
-        if voix_off:
-            start_time = i * duration_per_scene
-            end_time = (i + 1) * duration_per_scene
-            start_srt = format_time_srt(start_time)
-            end_srt = format_time_srt(end_time)
-            srt_content.append(f"{i + 1}")
-            srt_content.append(f"{start_srt} --> {end_srt}")
-            srt_content.append(voix_off)
-            srt_content.append("")
+    for i, (start_time, end_time, text) in enumerate(cues):
+        srt_content.append(f"{i + 1}")
+        srt_content.append(f"{format_time_srt(start_time)} --> {format_time_srt(end_time)}")
+        srt_content.append(text)
+        srt_content.append("")
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write('\n'.join(srt_content))
     return output_path
 
-def add_subtitles_with_ffmpeg(video_path, srt_path, output_path):
-    if not FFMPEG_AVAILABLE:
+def create_srt_file(script_data, output_path="subtitles.srt"):
+    cues = build_cues(script_data)
+    if not cues:
+        return None
+    return write_srt(cues, output_path)
+
+def shift_cues(cues, start, end):
+    """Sous-titres visibles entre start et end, recalés pour un segment qui commence à start"""
+    return [
+        (max(cue_start, start) - start, min(cue_end, end) - start, text)
+        for cue_start, cue_end, text in cues
+        if cue_end > start and cue_start < end
+    ]
+
+@tracing.traced("subtitles.burn")
+def add_subtitles_with_ffmpeg(video_path, srt_path, output_path, threads=None):
+    if not ffmpeg_available():
         return None
     cmd = [
-        'ffmpeg',
+        ffmpeg_exe(),
         '-i', video_path,
-        '-vf', f"subtitles={srt_path}:force_style='Fontsize=12,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2'",
+        '-vf', f"subtitles={srt_path}:force_style='{BURN_STYLE}'",
         '-c:a', 'copy',
-        '-y',
-        output_path
     ]
+    if threads:
+        cmd += ['-threads', str(threads)]
+    cmd += ['-y', output_path]
     result = subprocess.run(cmd, capture_output=True, text=True)
     return output_path if result.returncode == 0 else None
 
-def add_subtitles_to_video(video_path, script_data, output_path="video_avec_sous_titres.mp4"):
+def split_at_keyframes(video_path, folder, segment_seconds):
+    """Découpe la vidéo sans réencodage (coupures sur images clés) ; renvoie [(fichier, début, fin)]"""
+    list_path = os.path.join(folder, "segments.csv")
+    run_ffmpeg([
+        '-i', video_path, '-map', '0', '-c', 'copy',
+        '-f', 'segment', '-segment_time', f"{segment_seconds:.3f}", '-reset_timestamps', '1',
+        '-segment_list', list_path, '-segment_list_type', 'csv',
+        os.path.join(folder, "segment_%04d.mp4"),
+    ])
+    segments = []
+    with open(list_path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if row:
+                segments.append((os.path.join(folder, row[0]), float(row[1]), float(row[2])))
+    return segments
+
+@tracing.traced("subtitles.burn_parallel")
+def add_subtitles_parallel(video_path, script_data, output_path, workers=None, segment_seconds=None):
+    """Incrustation en parallèle : découpe sur images clés, un ffmpeg par segment avec ses
+    sous-titres recalés, puis réassemblage sans réencodage"""
+    if not ffmpeg_available():
+        return None
+    cues = build_cues(script_data)
+    if not cues:
+        return None
+    workers = max(1, workers or BURN_WORKERS)
+    duration = probe_duration(video_path)
+    if segment_seconds is None:
+        # Deux segments par worker pour équilibrer la charge, sans descendre sous le minimum
+        segment_seconds = max(BURN_MIN_SEGMENT_SECONDS, (duration or 0) / (workers * 2))
+
+    work_dir = tempfile.mkdtemp(prefix="sous_titres_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        segments = split_at_keyframes(video_path, work_dir, segment_seconds)
+        tracing.annotate(segments=len(segments), workers=workers)
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        def burn(index):
+            segment_path, start, end = segments[index]
+            burned_path = os.path.join(work_dir, f"burned_{index:04d}.mp4")
+            segment_cues = shift_cues(cues, start, end)
+            if not segment_cues:
+                # Rien à incruster : réencodage quand même pour garder des paramètres identiques au concat
+                segment_cues = [(0, 0.001, " ")]
+            srt_path = write_srt(segment_cues, os.path.join(work_dir, f"segment_{index:04d}.srt"))
+            if not add_subtitles_with_ffmpeg(segment_path, srt_path, burned_path, threads=threads):
+                raise Exception(f"Incrustation échouée pour le segment {index}")
+            return burned_path
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            burned = list(executor.map(burn, range(len(segments))))
+        concat_files(burned, output_path)
+        return output_path
+    except Exception as e:
+        print(f"❌ Incrustation parallèle échouée: {e}")
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+@tracing.traced("subtitles.mux")
+def mux_subtitles_with_ffmpeg(video_path, tracks, output_path):
+    """Ajoute une piste de sous-titres par (fichier SRT, langue) en copiant vidéo et audio tels quels"""
+    if not ffmpeg_available():
+        return None
+    extension = os.path.splitext(output_path)[1].lower()
+    cmd = [ffmpeg_exe(), '-i', video_path]
+    for srt_path, _ in tracks:
+        cmd += ['-i', srt_path]
+    cmd += ['-map', '0:v', '-map', '0:a?']
+    for i in range(len(tracks)):
+        cmd += ['-map', f'{i + 1}:0']
+    cmd += ['-c:v', 'copy', '-c:a', 'copy', '-c:s', SUBTITLE_CODECS.get(extension, 'mov_text')]
+    for i, (_, language) in enumerate(tracks):
+        cmd += [f'-metadata:s:s:{i}', f"language={LANGUAGE_CODES.get(language, language)}"]
+    cmd += ['-disposition:s:0', 'default', '-y', output_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return output_path if result.returncode == 0 else None
+
+@tracing.traced("subtitles.add")
+def add_subtitles_to_video(video_path, script_data, output_path="video_avec_sous_titres.mp4", mode=None,
+                           language=None, translations=None):
+    """Ajoute les sous-titres du script à la vidéo.
+
+    mode vaut "soft" (piste sans réencodage, par défaut via SUBTITLE_MODE) ou "burn" (incrustation) ;
+    translations ({langue: script traduit}) ajoute d'autres pistes en mode soft."""
     if not os.path.exists(video_path):
         print(f"❌ Fichier vidéo introuvable: {video_path}")
         return video_path
         
-    if not FFMPEG_AVAILABLE:
+    if not ffmpeg_available():
         print("❌ FFmpeg non disponible, retour de la vidéo sans sous-titres")
         return video_path
-    
-    srt_file = create_srt_file(script_data, "temp_subtitles.srt")
-    if srt_file:
-        result = add_subtitles_with_ffmpeg(video_path, srt_file, output_path)
+
+    mode = mode or SUBTITLE_MODE
+    tracing.annotate(mode=mode)
+    language = language or script_data.get('langue', 'fr')
+    base = os.path.splitext(output_path)[0]
+
+    if mode == "burn":
+        # En dessous de deux segments, découper ne fait rien gagner
+        if BURN_WORKERS > 1 and (probe_duration(video_path) or 0) >= 2 * BURN_MIN_SEGMENT_SECONDS:
+            result = add_subtitles_parallel(video_path, script_data, output_path)
+            if result:
+                return result
+        srt_file = create_srt_file(script_data, f"{base}.srt")
+        if srt_file:
+            result = add_subtitles_with_ffmpeg(video_path, srt_file, output_path)
+            try:
+                os.remove(srt_file)
+            except:
+                pass
+            if result:
+                return result
+        return video_path
+
+    tracks = []
+    for track_language, track_script in [(language, script_data), *(translations or {}).items()]:
+        srt_file = create_srt_file(track_script, f"{base}.{track_language}.srt")
+        if srt_file:
+            tracks.append((srt_file, track_language))
+    if not tracks:
+        return video_path
+    result = mux_subtitles_with_ffmpeg(video_path, tracks, output_path)
+    for srt_file, _ in tracks:
         try:
             os.remove(srt_file)
         except:
             pass
-        if result:
-            return result
-    return video_path
+    return result or video_path
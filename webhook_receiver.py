@@ -0,0 +1,186 @@
+import os
+import hmac
+import json
+import time
+import atexit
+import secrets
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import http_client
+import tracing
+
+load_dotenv()
+
+# URL publique à laquelle Synthesia peut joindre ce poste (tunnel, reverse proxy...) ;
+# SYNTHESIA_WEBHOOK=1 sans URL publique écoute en local (faux Synthesia, tests)
+WEBHOOK_PUBLIC_URL = os.getenv("SYNTHESIA_WEBHOOK_URL")
+WEBHOOK_ENABLED = bool(WEBHOOK_PUBLIC_URL) or os.getenv("SYNTHESIA_WEBHOOK", "0") == "1"
+WEBHOOK_HOST = os.getenv("SYNTHESIA_WEBHOOK_HOST", "0.0.0.0" if WEBHOOK_PUBLIC_URL else "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("SYNTHESIA_WEBHOOK_PORT", "8765"))
+# Sans notification après ce délai, on repasse au polling, espacé de FALLBACK_POLL_INTERVAL
+WEBHOOK_DEADLINE = float(os.getenv("SYNTHESIA_WEBHOOK_DEADLINE", "900"))
+FALLBACK_POLL_INTERVAL = float(os.getenv("SYNTHESIA_FALLBACK_POLL_INTERVAL", "60"))
+# Notifications que personne ne réclame (vidéo abandonnée, autre processus) oubliées après ce délai
+EVENT_TTL = float(os.getenv("SYNTHESIA_WEBHOOK_EVENT_TTL", "3600"))
+
+WEBHOOK_PATH = "/synthesia/webhook"
+EVENTS = ["video.completed", "video.failed"]
+
+
+def webhooks_url(api_url=None):
+    """.../v2/videos -> .../v2/webhooks"""
+    api_url = api_url or os.getenv("SYNTHESIA_API_URL", "https://api.synthesia.io/v2/videos")
+    return api_url.rstrip("/").rsplit("/videos", 1)[0] + "/webhooks"
+
+
+class WebhookReceiver:
+    """Petit serveur HTTP qui reçoit les notifications de fin de rendu Synthesia.
+
+    Le webhook est enregistré au démarrage avec un jeton secret dans l'URL ; chaque notification
+    réveille immédiatement le thread qui attend la vidéo concernée."""
+
+    def __init__(self, public_url=None, host=None, port=None, api_url=None, api_key=None):
+        self.api_url = api_url
+        self.api_key = api_key or os.getenv("SYNTHESIA_API_KEY")
+        self.token = secrets.token_urlsafe(16)
+        self.events = {}
+        self.received_at = {}
+        self.received = 0
+        self.condition = threading.Condition()
+        self.webhook_id = None
+
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                status = receiver.handle(self.path, self.rfile.read(length) if length else b"")
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host or WEBHOOK_HOST, WEBHOOK_PORT if port is None else port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+        bound_port = self.httpd.server_address[1]
+        self.public_url = (public_url or WEBHOOK_PUBLIC_URL or f"http://127.0.0.1:{bound_port}").rstrip("/")
+
+    @property
+    def callback_url(self):
+        return f"{self.public_url}{WEBHOOK_PATH}?token={self.token}"
+
+    def handle(self, path, body):
+        """Enregistre une notification et renvoie le code HTTP de la réponse"""
+        parsed = urlparse(path)
+        if parsed.path != WEBHOOK_PATH:
+            return 404
+        if not hmac.compare_digest(parse_qs(parsed.query).get("token", [""])[0], self.token):
+            return 403
+        try:
+            event = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return 400
+        data = event.get("data") or {}
+        video_id = data.get("id")
+        if not video_id:
+            return 400
+
+        status = data.get("status") or ("complete" if event.get("type") == "video.completed" else "failed")
+        with self.condition:
+            self._expire()
+            self.events[video_id] = {**data, "status": status}
+            self.received_at[video_id] = time.monotonic()
+            self.received += 1
+            self.condition.notify_all()
+        print(f"📬 Notification Synthesia: {video_id} {status}")
+        return 200
+
+    def _headers(self):
+        return {"Content-Type": "application/json", "Authorization": f"{self.api_key}"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="synthesia-webhook", daemon=True)
+        self.thread.start()
+        try:
+            self.register()
+        except Exception:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            raise
+        return self
+
+    @tracing.traced("synthesia.webhook_register")
+    def register(self):
+        response = http_client.post(webhooks_url(self.api_url), headers=self._headers(),
+                                    json={"url": self.callback_url, "events": EVENTS})
+        if response.status_code not in (200, 201):
+            raise Exception(f"Enregistrement du webhook refusé: HTTP {response.status_code} {response.text[:200]}")
+        self.webhook_id = response.json().get("id")
+        print(f"📬 Webhook Synthesia enregistré: {self.public_url}{WEBHOOK_PATH}")
+
+    def stop(self):
+        if self.webhook_id:
+            try:
+                http_client.request("DELETE", f"{webhooks_url(self.api_url)}/{self.webhook_id}",
+                                    headers=self._headers(), retries=0)
+            except Exception as e:
+                print(f"⚠️ Suppression du webhook impossible: {e}")
+            self.webhook_id = None
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _expire(self):
+        """Oublie les notifications non réclamées depuis EVENT_TTL (appelée sous self.condition)"""
+        limit = time.monotonic() - EVENT_TTL
+        for video_id in [video_id for video_id, at in self.received_at.items() if at < limit]:
+            self.events.pop(video_id, None)
+            del self.received_at[video_id]
+
+    def pop(self, video_id):
+        """Notification reçue pour cette vidéo, ou None (sans attendre) ; elle est alors consommée"""
+        with self.condition:
+            self.received_at.pop(video_id, None)
+            return self.events.pop(video_id, None)
+
+    def wait(self, video_id, timeout):
+        """Attend la notification d'une vidéo au plus timeout secondes ; None si rien n'est arrivé"""
+        with self.condition:
+            self.condition.wait_for(lambda: video_id in self.events, timeout)
+            self.received_at.pop(video_id, None)
+            return self.events.pop(video_id, None)
+
+    def wait_any(self, video_ids, timeout):
+        """Attend qu'au moins une des vidéos ait reçu sa notification (sans la consommer)"""
+        video_ids = set(video_ids)
+        with self.condition:
+            return self.condition.wait_for(lambda: not video_ids.isdisjoint(self.events), timeout)
+
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def get_receiver():
+    """Récepteur partagé, démarré au premier rendu ; None si les webhooks ne sont pas configurés
+    ou si l'enregistrement échoue (on reste alors au polling)"""
+    global _receiver
+    if not WEBHOOK_ENABLED:
+        return None
+    with _receiver_lock:
+        if _receiver is None:
+            try:
+                _receiver = WebhookReceiver().start()
+                atexit.register(_receiver.stop)
+            except Exception as e:
+                print(f"⚠️ Webhooks indisponibles, suivi par polling: {e}")
+                _receiver = False
+    return _receiver or None